@@ -0,0 +1,37 @@
+"""Add sample product code search index
+
+Revision ID: 3c9f0a7e6d24
+Revises: b5a19d3c7e82
+Create Date: 2026-10-20 09:12:31.640287
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c9f0a7e6d24'
+down_revision: Union[str, None] = 'b5a19d3c7e82'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SAMPLE_TABLES = ('samples_retained', 'samples_referenced')
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    for table in SAMPLE_TABLES:
+        op.create_index(op.f(f'ix_{table}_product_code_id'), table, ['product_code', 'id'], unique=False)
+        # The index MySQL created for the dropped product foreign key is
+        # covered by the new one
+        for index in inspector.get_indexes(table):
+            if index['column_names'] == ['product_code']:
+                op.drop_index(index['name'], table_name=table)
+
+
+def downgrade() -> None:
+    for table in SAMPLE_TABLES:
+        op.create_index(op.f(f'ix_{table}_product_code'), table, ['product_code'], unique=False)
+        op.drop_index(op.f(f'ix_{table}_product_code_id'), table_name=table)
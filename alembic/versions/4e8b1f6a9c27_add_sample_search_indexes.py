@@ -0,0 +1,29 @@
+"""Add sample search indexes
+
+Revision ID: 4e8b1f6a9c27
+Revises: 9a4c2e7d1b38
+Create Date: 2026-10-19 11:03:52.118406
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4e8b1f6a9c27'
+down_revision: Union[str, None] = '9a4c2e7d1b38'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(op.f('ix_samples_retained_batch_number'), 'samples_retained', ['batch_number'], unique=False)
+    op.create_index(op.f('ix_samples_referenced_batch_number'), 'samples_referenced', ['batch_number'], unique=False)
+    op.create_index(op.f('ix_products_product_name'), 'products', ['product_name'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_products_product_name'), table_name='products')
+    op.drop_index(op.f('ix_samples_referenced_batch_number'), table_name='samples_referenced')
+    op.drop_index(op.f('ix_samples_retained_batch_number'), table_name='samples_retained')
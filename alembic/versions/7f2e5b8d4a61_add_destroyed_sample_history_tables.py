@@ -0,0 +1,47 @@
+"""Add destroyed sample history tables
+
+Revision ID: 7f2e5b8d4a61
+Revises: c3d7a95e2f14
+Create Date: 2026-10-19 12:26:44.907153
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7f2e5b8d4a61'
+down_revision: Union[str, None] = 'c3d7a95e2f14'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+HISTORY_TABLES = ('samples_retained_history', 'samples_referenced_history')
+
+
+def upgrade() -> None:
+    for table in HISTORY_TABLES:
+        op.create_table(
+            table,
+            sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+            sa.Column('rack_id', sa.String(length=5), nullable=True),
+            sa.Column('product_code', sa.String(length=5), nullable=True),
+            sa.Column('batch_number', sa.String(length=5), nullable=True),
+            sa.Column('manufacturing_date', sa.Date(), nullable=True),
+            sa.Column('expiration_date', sa.Date(), nullable=True),
+            sa.Column('destroy_date', sa.Date(), nullable=True),
+            sa.Column('destroyed_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f(f'ix_{table}_product_code'), table, ['product_code'], unique=False)
+        op.create_index(op.f(f'ix_{table}_batch_number'), table, ['batch_number'], unique=False)
+        op.create_index(op.f(f'ix_{table}_destroy_date'), table, ['destroy_date'], unique=False)
+
+
+def downgrade() -> None:
+    for table in HISTORY_TABLES:
+        op.drop_index(op.f(f'ix_{table}_destroy_date'), table_name=table)
+        op.drop_index(op.f(f'ix_{table}_batch_number'), table_name=table)
+        op.drop_index(op.f(f'ix_{table}_product_code'), table_name=table)
+        op.drop_table(table)
@@ -0,0 +1,75 @@
+"""Partition audit table by month
+
+Revision ID: 9a4c2e7d1b38
+Revises: f1a7c3e92b05
+Create Date: 2026-10-19 10:12:31.482913
+
+"""
+from datetime import date
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9a4c2e7d1b38'
+down_revision: Union[str, None] = 'f1a7c3e92b05'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _next_month(day: date) -> date:
+    if day.month == 12:
+        return date(day.year + 1, 1, 1)
+    return date(day.year, day.month + 1, 1)
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    op.execute("UPDATE audit SET timestamp = CURRENT_TIMESTAMP WHERE timestamp IS NULL")
+
+    if bind.dialect.name != "mysql":
+        op.alter_column('audit', 'timestamp', existing_type=sa.DateTime(timezone=True), nullable=False)
+        return
+
+    # MySQL requires the partitioning column in every unique key, primary key included
+    op.execute(
+        "ALTER TABLE audit "
+        "MODIFY timestamp DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP, "
+        "DROP PRIMARY KEY, ADD PRIMARY KEY (id, timestamp)"
+    )
+
+    # One partition per month from the oldest entry up to next month, the rest
+    # lands in pmax until `python manage.py audit-partitions` splits it
+    oldest = bind.execute(sa.text("SELECT MIN(timestamp) FROM audit")).scalar()
+    month = date(oldest.year, oldest.month, 1) if oldest else date.today().replace(day=1)
+    last = _next_month(date.today())
+    definitions = []
+    while month <= last:
+        upper = _next_month(month)
+        definitions.append(
+            f"PARTITION p{month.year}{month.month:02d} VALUES LESS THAN ('{upper.isoformat()}')"
+        )
+        month = upper
+    definitions.append("PARTITION pmax VALUES LESS THAN (MAXVALUE)")
+
+    op.execute(
+        "ALTER TABLE audit PARTITION BY RANGE COLUMNS (timestamp) ("
+        + ", ".join(definitions)
+        + ")"
+    )
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != "mysql":
+        op.alter_column('audit', 'timestamp', existing_type=sa.DateTime(timezone=True), nullable=True)
+        return
+
+    op.execute("ALTER TABLE audit REMOVE PARTITIONING")
+    op.execute(
+        "ALTER TABLE audit "
+        "DROP PRIMARY KEY, ADD PRIMARY KEY (id), "
+        "MODIFY timestamp DATETIME NULL DEFAULT CURRENT_TIMESTAMP"
+    )
@@ -0,0 +1,121 @@
+"""Partition sample tables by destroy date
+
+Revision ID: b5a19d3c7e82
+Revises: 7f2e5b8d4a61
+Create Date: 2026-10-19 13:08:15.264930
+
+"""
+from datetime import date
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5a19d3c7e82'
+down_revision: Union[str, None] = '7f2e5b8d4a61'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SAMPLE_TABLES = ('samples_retained', 'samples_referenced')
+# Destroy dates lie years ahead, so partitions are created well in advance
+MONTHS_AHEAD = 60
+# Date arithmetic of helpers.utils, copied so the migration does not change with it
+DAYS_PER_MONTH = 31
+DESTROY_OFFSET_DAYS = 13 * DAYS_PER_MONTH
+
+
+def _next_month(day: date) -> date:
+    if day.month == 12:
+        return date(day.year + 1, 1, 1)
+    return date(day.year, day.month + 1, 1)
+
+
+def _partition_definitions(first: date, last: date) -> list[str]:
+    definitions = []
+    month = date(first.year, first.month, 1)
+    while month <= last:
+        upper = _next_month(month)
+        definitions.append(
+            f"PARTITION p{month.year}{month.month:02d} VALUES LESS THAN ('{upper.isoformat()}')"
+        )
+        month = upper
+    definitions.append("PARTITION pmax VALUES LESS THAN (MAXVALUE)")
+    return definitions
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != "mysql":
+        return
+
+    # The partitioning column cannot be NULL. Missing dates are computed from
+    # the product shelf life like `recompute_sample_dates` does, before any
+    # DDL runs, so a sample without a usable product stops the migration
+    for table in SAMPLE_TABLES:
+        op.execute(
+            f"UPDATE {table} s JOIN products p ON p.product_code = s.product_code "
+            f"SET s.expiration_date = ADDDATE(s.manufacturing_date, "
+            f"TRUNCATE(p.shelf_life * 12, 0) * {DAYS_PER_MONTH}), "
+            f"s.destroy_date = ADDDATE(s.manufacturing_date, "
+            f"TRUNCATE(p.shelf_life * 12, 0) * {DAYS_PER_MONTH} + {DESTROY_OFFSET_DAYS}) "
+            "WHERE s.destroy_date IS NULL AND s.manufacturing_date IS NOT NULL"
+        )
+        missing = bind.execute(
+            sa.text(f"SELECT COUNT(*) FROM {table} WHERE destroy_date IS NULL")
+        ).scalar()
+        if missing:
+            raise RuntimeError(
+                f"{missing} rows of {table} have no destroy date and no manufacturing "
+                "date or product to compute it from; fix or delete them and rerun"
+            )
+
+    for table in SAMPLE_TABLES:
+        # MySQL does not support foreign keys on partitioned tables, the
+        # indexes behind them stay in place
+        foreign_keys = bind.execute(
+            sa.text(
+                "SELECT CONSTRAINT_NAME FROM information_schema.REFERENTIAL_CONSTRAINTS "
+                "WHERE CONSTRAINT_SCHEMA = DATABASE() AND TABLE_NAME = :table"
+            ),
+            {"table": table},
+        ).scalars().all()
+        for name in foreign_keys:
+            op.drop_constraint(name, table, type_='foreignkey')
+
+        # The partitioning column has to be part of the primary key
+        op.execute(
+            f"ALTER TABLE {table} "
+            "MODIFY destroy_date DATE NOT NULL, "
+            "DROP PRIMARY KEY, ADD PRIMARY KEY (id, destroy_date)"
+        )
+
+        first, last = bind.execute(
+            sa.text(f"SELECT MIN(destroy_date), MAX(destroy_date) FROM {table}")
+        ).one()
+        today = date.today()
+        ahead = today
+        for _ in range(MONTHS_AHEAD):
+            ahead = _next_month(ahead)
+        op.execute(
+            f"ALTER TABLE {table} PARTITION BY RANGE COLUMNS (destroy_date) ("
+            + ", ".join(_partition_definitions(first or today, max(last or ahead, ahead)))
+            + ")"
+        )
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != "mysql":
+        return
+
+    for table in SAMPLE_TABLES:
+        op.execute(f"ALTER TABLE {table} REMOVE PARTITIONING")
+        op.execute(
+            f"ALTER TABLE {table} "
+            "DROP PRIMARY KEY, ADD PRIMARY KEY (id), "
+            "MODIFY destroy_date DATE NULL"
+        )
+        op.create_foreign_key(None, table, 'racks', ['rack_id'], ['rack_id'])
+        op.create_foreign_key(None, table, 'products', ['product_code'], ['product_code'])
@@ -0,0 +1,34 @@
+"""Add sample filter indexes
+
+Revision ID: c3d7a95e2f14
+Revises: 4e8b1f6a9c27
+Create Date: 2026-10-19 11:41:07.530219
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3d7a95e2f14'
+down_revision: Union[str, None] = '4e8b1f6a9c27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SAMPLE_TABLES = ('samples_retained', 'samples_referenced')
+DATE_COLUMNS = ('manufacturing_date', 'expiration_date', 'destroy_date')
+
+
+def upgrade() -> None:
+    for table in SAMPLE_TABLES:
+        for column in DATE_COLUMNS:
+            op.create_index(op.f(f'ix_{table}_{column}'), table, [column], unique=False)
+    op.create_index(op.f('ix_products_product_type'), 'products', ['product_type'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_products_product_type'), table_name='products')
+    for table in SAMPLE_TABLES:
+        for column in DATE_COLUMNS:
+            op.drop_index(op.f(f'ix_{table}_{column}'), table_name=table)
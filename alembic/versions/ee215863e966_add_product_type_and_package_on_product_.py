@@ -18,15 +18,27 @@ branch_labels: Union[str, Sequence[str], None] = None
 depends_on: Union[str, Sequence[str], None] = None
 
 
+def _product_columns() -> set:
+    # Revision 23a024768368 adds the same columns on a parallel branch, both
+    # branches are merged later, so whichever runs second finds them in place
+    return {column['name'] for column in sa.inspect(op.get_bind()).get_columns('products')}
+
+
 def upgrade() -> None:
+    columns = _product_columns()
     # ### commands auto generated by Alembic - please adjust! ###
-    op.add_column('products', sa.Column('product_type', sa.String(length=10), nullable=True))
-    op.add_column('products', sa.Column('package', sa.String(length=255), nullable=True))
+    if 'product_type' not in columns:
+        op.add_column('products', sa.Column('product_type', sa.String(length=10), nullable=True))
+    if 'package' not in columns:
+        op.add_column('products', sa.Column('package', sa.String(length=255), nullable=True))
     # ### end Alembic commands ###
 
 
 def downgrade() -> None:
+    columns = _product_columns()
     # ### commands auto generated by Alembic - please adjust! ###
-    op.drop_column('products', 'package')
-    op.drop_column('products', 'product_type')
+    if 'package' in columns:
+        op.drop_column('products', 'package')
+    if 'product_type' in columns:
+        op.drop_column('products', 'product_type')
     # ### end Alembic commands ###
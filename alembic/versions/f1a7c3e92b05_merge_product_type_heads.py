@@ -0,0 +1,23 @@
+"""Merge the two product type and package heads
+
+Revision ID: f1a7c3e92b05
+Revises: ee215863e966, 23a024768368
+Create Date: 2026-10-19 10:05:12.640318
+
+"""
+from typing import Sequence, Union
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1a7c3e92b05'
+down_revision: Union[str, None] = ('ee215863e966', '23a024768368')
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    pass
+
+
+def downgrade() -> None:
+    pass
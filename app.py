@@ -5,19 +5,27 @@ import uvicorn
 from dotenv import load_dotenv
 from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
 from fastapi.params import Depends
 from sqlalchemy.exc import SQLAlchemyError
 
-from config.db import SessionLocal, engine
-from models import models
+from config import migrations, server
+from config.db import SessionLocal, engine, replica_engine
+from helpers.audit_sink import audit_sink
+from helpers.instrumentation import RequestTimingMiddleware, measure
+from helpers.metrics import AUDIT_WRITE_LATENCY, MetricsMiddleware
+from helpers.replica import ReadYourWritesMiddleware
 from models.models import Base
 from routes.actions import auth_action
 from routes.audit_trail import audit_router
 from routes.auth import auth_router
+from routes.diagnostics import diagnostics_router
+from routes.metrics import metrics_router
 from routes.product import products_router
 from routes.rack import rack_router
 from routes.sample_reference import reference_router
 from routes.sample_retained import retained_router
+from routes.samples import samples_router
 from routes.stats import stats_router
 from routes.user import users_router
 
@@ -26,11 +34,20 @@ load_dotenv()
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    try:
-        Base.metadata.create_all(bind=engine)
-        print("Database schema created successfully.")
-    except SQLAlchemyError as e:
-        print("An error occurred while creating the database schema:", e)
+    # Creating the schema from the models is only meant for throwaway databases,
+    # everything else is migrated with Alembic
+    if os.getenv("DB_CREATE_ALL", "false").lower() == "true":
+        try:
+            Base.metadata.create_all(bind=engine)
+            print("Database schema created successfully.")
+        except SQLAlchemyError as e:
+            print("An error occurred while creating the database schema:", e)
+    else:
+        try:
+            if not migrations.is_schema_up_to_date(engine):
+                print("Database schema is outdated, run `alembic upgrade head`.")
+        except SQLAlchemyError as e:
+            print("An error occurred while checking the database schema:", e)
     yield
 
 
@@ -51,6 +68,10 @@ app.add_middleware(
     allow_headers=["*"],
     expose_headers=["*"],
 )
+app.add_middleware(RequestTimingMiddleware)
+app.add_middleware(MetricsMiddleware)
+if replica_engine is not None:
+    app.add_middleware(ReadYourWritesMiddleware)
 
 
 async def db_session_middleware(request: Request, response: Response):
@@ -62,39 +83,43 @@ async def db_session_middleware(request: Request, response: Response):
             filter not in request.url.__str__()
             for filter in ["docs", "openapi.json", "favicon.ico", "authentication"]
         ) and request.method not in ["GET", "OPTIONS"]:
-            await store_audit_middleware(request, db=request.state.db)
+            await store_audit_middleware(request)
     finally:
         request.state.db.close()
 
     return response_exc
 
 
-async def store_audit_middleware(
-    request: Request,
-    db,
-):
+async def store_audit_middleware(request: Request):
     username = request.state.username
 
-    audit_entry = models.Audit()
-    audit_entry.url = request.url.__str__()
-    audit_entry.headers = username if username else ""
-
-    audit_entry.method = request.method
-    audit_entry.request = await request.body()
-    db.add(audit_entry)
-    db.commit()
+    audit_entry = {
+        "url": request.url.__str__(),
+        "headers": username if username else "",
+        "method": request.method,
+        "request": (await request.body()).decode("utf-8", "replace"),
+    }
+    # Sinks block on the database or on fsync, keep that off the event loop
+    with measure("audit"), AUDIT_WRITE_LATENCY.time():
+        await run_in_threadpool(audit_sink.write, audit_entry)
     return audit_entry
 
 
 PROTECTED = [Depends(auth_action.get_current_user), Depends(db_session_middleware)]
 app.include_router(auth_router)
+app.include_router(metrics_router)
 app.include_router(users_router, dependencies=PROTECTED)
 app.include_router(audit_router, dependencies=PROTECTED)
 app.include_router(products_router, dependencies=PROTECTED)
 app.include_router(retained_router, dependencies=PROTECTED)
 app.include_router(reference_router, dependencies=PROTECTED)
+app.include_router(samples_router, dependencies=PROTECTED)
 app.include_router(rack_router, dependencies=PROTECTED)
 app.include_router(stats_router, dependencies=PROTECTED)
+app.include_router(diagnostics_router, dependencies=PROTECTED)
 
 if __name__ == "__main__":
-    uvicorn.run("app:app", host="0.0.0.0", port=8000, reload=True)
+    if os.getenv("APP_ENV") == "production":
+        server.run_production()
+    else:
+        uvicorn.run("app:app", host="0.0.0.0", port=8000, reload=True)
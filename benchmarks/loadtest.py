@@ -0,0 +1,328 @@
+"""Drives a realistic request mix against the API and records latencies.
+
+Seed the database first with `benchmarks.seed`, then:
+
+    python -m benchmarks.loadtest --label 1m --requests 500 --concurrency 16
+
+The app is started on a free local port against `DATABASE_URL` unless `--url`
+points at a server that is already running. Every scenario is first run on
+its own, which isolates its database query count, and then all of them run
+together in a weighted mix. Results are written to `benchmarks/results/`.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from collections import Counter
+from datetime import date
+
+import httpx
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import NullPool
+
+from benchmarks.seed import (
+    BENCH_PASSWORD,
+    BENCH_USERNAME,
+    PRODUCT_COUNT,
+    PRODUCT_TYPES,
+    encode,
+)
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(PROJECT_ROOT, "benchmarks", "results")
+
+# Relative weight of every scenario in the mixed phase
+MIX = {
+    "login": 5,
+    "create_sample": 15,
+    "list_page": 40,
+    "destroy_listing": 15,
+    "report": 5,
+    "stats": 20,
+}
+
+
+class Context:
+    def __init__(self, token: str, retained_count: int):
+        self.headers = {"Authorization": f"Bearer {token}"}
+        self.retained_count = retained_count
+
+
+def random_month() -> dict:
+    return {"month": random.randint(1, 12), "year": random.randint(2018, 2028)}
+
+
+async def login(client: httpx.AsyncClient, context: Context) -> httpx.Response:
+    return await client.post(
+        "/authentication/login",
+        data={"username": BENCH_USERNAME, "password": BENCH_PASSWORD},
+    )
+
+
+async def create_sample(client: httpx.AsyncClient, context: Context):
+    manufacturing_date = date(2024, random.randint(1, 12), random.randint(1, 28))
+    return await client.post(
+        "/retained/",
+        headers=context.headers,
+        json={
+            "product_code": encode(random.randrange(PRODUCT_COUNT), "P"),
+            "batch_number": encode(random.randrange(36**4), "X"),
+            "manufacturing_date": manufacturing_date.isoformat(),
+        },
+    )
+
+
+async def list_page(client: httpx.AsyncClient, context: Context):
+    return await client.get(
+        "/retained/",
+        headers=context.headers,
+        params={"skip": random.randrange(max(context.retained_count, 1)), "limit": 50},
+    )
+
+
+async def destroy_listing(client: httpx.AsyncClient, context: Context):
+    return await client.get(
+        "/retained/destroy",
+        headers=context.headers,
+        params={**random_month(), "type": random.choice(PRODUCT_TYPES)},
+    )
+
+
+async def report(client: httpx.AsyncClient, context: Context):
+    return await client.post(
+        "/retained/generate-destroy-report",
+        headers=context.headers,
+        params={**random_month(), "package_type": random.choice(PRODUCT_TYPES)},
+        json=[],
+    )
+
+
+async def stats(client: httpx.AsyncClient, context: Context):
+    return await client.get("/stats/retained_samples/count", headers=context.headers)
+
+
+SCENARIOS = {
+    "login": login,
+    "create_sample": create_sample,
+    "list_page": list_page,
+    "destroy_listing": destroy_listing,
+    "report": report,
+    "stats": stats,
+}
+
+
+class QueryCounter:
+    """Reads MySQL's global statement counter around a phase.
+
+    Returns None on other databases, where no such counter exists.
+    """
+
+    def __init__(self, database_url: str):
+        self.engine = None
+        if database_url.startswith("mysql"):
+            self.engine = create_engine(database_url, poolclass=NullPool)
+
+    def read(self) -> int | None:
+        if self.engine is None:
+            return None
+        with self.engine.connect() as connection:
+            row = connection.execute(text("SHOW GLOBAL STATUS LIKE 'Questions'"))
+            # Leave out the SHOW STATUS statement itself
+            return int(row.one()[1]) - 1
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(int(round(fraction * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def summarize(latencies: list[float], statuses: Counter, elapsed: float) -> dict:
+    ordered = sorted(latencies)
+    errors = sum(count for status, count in statuses.items() if status >= 400)
+    return {
+        "requests": len(ordered),
+        "errors": errors,
+        "status_codes": {str(status): count for status, count in statuses.items()},
+        "p50_ms": round(percentile(ordered, 0.50), 2),
+        "p95_ms": round(percentile(ordered, 0.95), 2),
+        "p99_ms": round(percentile(ordered, 0.99), 2),
+        "max_ms": round(ordered[-1], 2) if ordered else 0.0,
+        "throughput_rps": round(len(ordered) / elapsed, 1) if elapsed else 0.0,
+    }
+
+
+async def run_phase(
+    client: httpx.AsyncClient,
+    context: Context,
+    scenario_names: list[str],
+    weights: list[int],
+    requests: int,
+    concurrency: int,
+) -> tuple[dict, float]:
+    latencies = {name: [] for name in set(scenario_names)}
+    statuses = {name: Counter() for name in set(scenario_names)}
+    remaining = iter(range(requests))
+
+    async def worker():
+        for _ in remaining:
+            name = random.choices(scenario_names, weights)[0]
+            started = time.perf_counter()
+            try:
+                response = await SCENARIOS[name](client, context)
+                status = response.status_code
+            except httpx.HTTPError:
+                status = 599
+            latencies[name].append((time.perf_counter() - started) * 1000)
+            statuses[name][status] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        name: summarize(latencies[name], statuses[name], elapsed) for name in latencies
+    }, elapsed
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port: int, workers: int) -> subprocess.Popen:
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "app:app",
+            "--port",
+            str(port),
+            "--workers",
+            str(workers),
+            "--loop",
+            "uvloop",
+            "--http",
+            "httptools",
+            "--no-access-log",
+        ],
+        cwd=PROJECT_ROOT,
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/docs").status_code == 200:
+                return process
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("The API did not start within 60 seconds")
+
+
+async def run(args) -> dict:
+    counter = QueryCounter(os.environ["DATABASE_URL"])
+
+    async with httpx.AsyncClient(base_url=args.url, timeout=120) as client:
+        response = await login(client, None)
+        response.raise_for_status()
+        context = Context(response.json()["access_token"], 0)
+        response = await stats(client, context)
+        context.retained_count = response.json()
+
+        endpoints = {}
+        for name in SCENARIOS:
+            before = counter.read()
+            endpoints[name], _ = await run_phase(
+                client, context, [name], [1], args.requests, args.concurrency
+            )
+            after = counter.read()
+            if before is not None:
+                endpoints[name][name]["queries_per_request"] = round(
+                    (after - before) / args.requests, 2
+                )
+            endpoints[name] = endpoints[name][name]
+
+        mix, elapsed = await run_phase(
+            client,
+            context,
+            list(MIX),
+            list(MIX.values()),
+            args.requests * len(MIX),
+            args.concurrency,
+        )
+
+    return {
+        "endpoints": endpoints,
+        "mix": {
+            "endpoints": mix,
+            "throughput_rps": round(args.requests * len(MIX) / elapsed, 1),
+        },
+    }
+
+
+def git_revision() -> str | None:
+    completed = subprocess.run(
+        ["git", "rev-parse", "--short", "HEAD"],
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        text=True,
+    )
+    return completed.stdout.strip() or None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="Use a running server instead of starting one")
+    parser.add_argument("--label", default="local", help="E.g. the seeded scale")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="Results file, defaults to benchmarks/results")
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    server = None
+    if not args.url:
+        port = free_port()
+        server = start_server(port, args.workers)
+        args.url = f"http://127.0.0.1:{port}"
+
+    try:
+        results = asyncio.run(run(args))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    results = {
+        "label": args.label,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "revision": git_revision(),
+        "requests_per_scenario": args.requests,
+        "concurrency": args.concurrency,
+        "workers": args.workers,
+        **results,
+    }
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"loadtest-{args.label}-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as file:
+        json.dump(results, file, indent=2)
+    print(json.dumps(results, indent=2))
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""Seeds a local database with synthetic inventory for the benchmarks.
+
+    python -m benchmarks.seed --scale 1m --truncate
+
+Only run this against a dedicated benchmark database: `--truncate` empties the
+sample, product and rack tables first.
+"""
+
+import argparse
+import math
+import random
+import string
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import delete, insert
+
+from config.db import SessionLocal, engine
+from helpers import auth_utils
+from helpers.utils import add_years_and_months
+from models import models
+
+SCALES = {"10k": 10_000, "1m": 1_000_000, "10m": 10_000_000}
+PRODUCT_TYPES = ("Liquid", "Powder", "Capsule")
+PRODUCT_COUNT = 2_000
+SAMPLES_PER_RACK = 500
+INSERT_CHUNK_SIZE = 10_000
+FIRST_MANUFACTURING_DATE = date(2015, 1, 1)
+MANUFACTURING_DAYS = 3_650
+
+BENCH_USERNAME = "bench"
+BENCH_PASSWORD = "bench"
+
+ALPHABET = string.digits + string.ascii_uppercase
+
+
+def encode(number: int, prefix: str) -> str:
+    """Turns a sequence number into a 5 character identifier."""
+
+    digits = ""
+    for _ in range(4):
+        number, remainder = divmod(number, len(ALPHABET))
+        digits = ALPHABET[remainder] + digits
+    return prefix + digits
+
+
+def product_rows():
+    for number in range(PRODUCT_COUNT):
+        yield {
+            "product_code": encode(number, "P"),
+            "product_name": f"Benchmark Product {number}",
+            "shelf_life": random.choice((1, 1.5, 2, 3)),
+            "product_type": PRODUCT_TYPES[number % len(PRODUCT_TYPES)],
+            "package": random.choice(("Box", "Sachet", "Bottle")),
+        }
+
+
+def rack_rows(rack_count: int):
+    for number in range(rack_count):
+        yield {
+            "rack_id": encode(number, "R"),
+            "max_stored": SAMPLES_PER_RACK + SAMPLES_PER_RACK // 5,
+            "location": f"Room {number % 10}",
+        }
+
+
+def sample_rows(offset: int, count: int, products: list[dict]):
+    for number in range(offset, offset + count):
+        product = products[number % len(products)]
+        manufacturing_date = FIRST_MANUFACTURING_DATE + timedelta(
+            days=random.randrange(MANUFACTURING_DAYS)
+        )
+        expiration_date = add_years_and_months(
+            manufacturing_date, product["shelf_life"]
+        )
+        yield {
+            "rack_id": encode(number // SAMPLES_PER_RACK, "R"),
+            "product_code": product["product_code"],
+            "batch_number": encode(number, "B"),
+            "manufacturing_date": manufacturing_date,
+            "expiration_date": expiration_date,
+            "destroy_date": add_years_and_months(expiration_date, 1, 1),
+        }
+
+
+def insert_chunked(table, rows) -> int:
+    inserted = 0
+    chunk = []
+    with engine.begin() as connection:
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) == INSERT_CHUNK_SIZE:
+                connection.execute(insert(table), chunk)
+                inserted += len(chunk)
+                chunk = []
+        if chunk:
+            connection.execute(insert(table), chunk)
+            inserted += len(chunk)
+    return inserted
+
+
+def truncate():
+    with engine.begin() as connection:
+        for model in (
+            models.SampleRetained,
+            models.SampleReferenced,
+            models.Product,
+            models.Rack,
+        ):
+            connection.execute(delete(model))
+
+
+def ensure_bench_user():
+    db = SessionLocal()
+    try:
+        user = (
+            db.query(models.User).filter(models.User.username == BENCH_USERNAME).first()
+        )
+        if user is None:
+            db.add(
+                models.User(
+                    username=BENCH_USERNAME,
+                    password=auth_utils.hash_pass(BENCH_PASSWORD),
+                    is_admin=True,
+                )
+            )
+            db.commit()
+    finally:
+        db.close()
+
+
+def seed(scale: str, seed_value: int = 7) -> dict:
+    random.seed(seed_value)
+    sample_count = SCALES[scale]
+    # Every sample table gets half of the samples
+    per_table = sample_count // 2
+    rack_count = math.ceil(per_table * 2 / SAMPLES_PER_RACK)
+
+    started = time.perf_counter()
+    products = list(product_rows())
+    insert_chunked(models.Product.__table__, products)
+    insert_chunked(models.Rack.__table__, rack_rows(rack_count))
+    for offset, model in enumerate((models.SampleRetained, models.SampleReferenced)):
+        insert_chunked(
+            model.__table__,
+            sample_rows(offset * per_table, per_table, products),
+        )
+    ensure_bench_user()
+
+    return {
+        "scale": scale,
+        "products": len(products),
+        "racks": rack_count,
+        "samples": per_table * 2,
+        "elapsed_seconds": round(time.perf_counter() - started, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", choices=SCALES, default="10k")
+    parser.add_argument("--truncate", action="store_true")
+    args = parser.parse_args()
+
+    if args.truncate:
+        truncate()
+    print(seed(args.scale))
+
+
+if __name__ == "__main__":
+    main()
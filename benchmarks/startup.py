@@ -0,0 +1,98 @@
+"""Measures how long a fresh API process takes to become ready.
+
+The first run is the cold start. The following runs approximate a worker
+respawn, where the interpreter and the OS file cache are already warm. Each
+run imports `app` and enters its lifespan in a new interpreter, exactly like
+a uvicorn worker does before accepting requests.
+
+    python -m benchmarks.startup --runs 10 --output startup.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import asyncio, json, sys, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+
+async def enter_lifespan():
+    async with app.app.router.lifespan_context(app.app):
+        pass
+
+asyncio.run(enter_lifespan())
+ready = time.perf_counter()
+heavy = sorted(m for m in ("fpdf", "PIL", "fontTools") if m in sys.modules)
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "lifespan_ms": (ready - imported) * 1000,
+    "heavy_modules": heavy,
+}))
+"""
+
+
+def run_probe() -> dict:
+    started = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    wall_ms = (time.perf_counter() - started) * 1000
+
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result["wall_ms"] = wall_ms
+    return result
+
+
+def summarize(samples: list[dict], key: str) -> dict:
+    values = [sample[key] for sample in samples]
+    return {
+        "min": round(min(values), 1),
+        "median": round(statistics.median(values), 1),
+        "max": round(max(values), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    cold = run_probe()
+    respawns = [run_probe() for _ in range(args.runs)]
+
+    results = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "cold_start": {
+            key: round(value, 1) if isinstance(value, float) else value
+            for key, value in cold.items()
+        },
+        "respawn": {
+            "runs": args.runs,
+            "wall_ms": summarize(respawns, "wall_ms"),
+            "import_ms": summarize(respawns, "import_ms"),
+            "lifespan_ms": summarize(respawns, "lifespan_ms"),
+        },
+    }
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
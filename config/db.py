@@ -1,11 +1,139 @@
 import os
 
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import Delete, Insert, Update, create_engine, event
+from sqlalchemy.engine import URL, Engine, make_url
+from sqlalchemy.orm import Session, sessionmaker
+
+from helpers.instrumentation import (
+    TimedQueuePool,
+    current_scope,
+    install_engine_hooks,
+)
+from helpers.metrics import install_pool_metrics
+from helpers.replica import ReplicaLagMonitor, reads_from_replica
+from helpers.slow_queries import slow_query_log
 
 load_dotenv()
 
-engine = create_engine(os.getenv("DATABASE_URL"))
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def get_engine_settings() -> dict:
+    """
+    Reads the connection pool and driver options from the environment.
+    """
+
+    return {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "5")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "10")),
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "30")),
+        # Below the server's idle timeout, so connections are replaced before
+        # MySQL closes them and reports "server has gone away"
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+        "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "true").lower() == "true",
+        "statement_timeout_ms": int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0")),
+        "driver": os.getenv("DB_DRIVER", ""),
+    }
+
+
+def database_url(url: str, driver: str) -> URL:
+    """
+    Swaps the driver of a MySQL URL, e.g. `pymysql` or `mysqldb` for the C
+    based mysqlclient. Other URLs and an empty driver are left as they are.
+    """
+
+    url = make_url(url)
+    if driver and url.get_backend_name() == "mysql":
+        url = url.set(drivername=f"mysql+{driver}")
+    return url
+
+
+def install_statement_timeout(engine: Engine, timeout_ms: int) -> None:
+    """
+    Makes the server abort statements of this engine that run longer than
+    `timeout_ms`. On MySQL this only applies to read-only SELECT statements.
+    """
+
+    statements = {
+        "mysql": f"SET SESSION max_execution_time = {timeout_ms}",
+        "postgresql": f"SET statement_timeout = {timeout_ms}",
+    }
+    statement = statements.get(engine.dialect.name)
+    if statement is None:
+        return
+
+    @event.listens_for(engine, "connect")
+    def set_statement_timeout(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(statement)
+        cursor.close()
+
+
+def create_app_engine(
+    url: str, name: str, statement_timeout_ms: int | None = None
+) -> Engine:
+    """
+    Creates an engine configured by `get_engine_settings`. The statement
+    timeout of the settings can be overridden, 0 disables it.
+    """
+
+    settings = get_engine_settings()
+    if statement_timeout_ms is None:
+        statement_timeout_ms = settings["statement_timeout_ms"]
+    engine = create_engine(
+        database_url(url, settings["driver"]),
+        pool_size=settings["pool_size"],
+        max_overflow=settings["max_overflow"],
+        pool_timeout=settings["pool_timeout"],
+        pool_recycle=settings["pool_recycle"],
+        pool_pre_ping=settings["pool_pre_ping"],
+        poolclass=TimedQueuePool,
+    )
+    if statement_timeout_ms:
+        install_statement_timeout(engine, statement_timeout_ms)
+    install_engine_hooks(engine)
+    install_pool_metrics(engine, name)
+    slow_query_log.install(engine)
+    return engine
+
+
+engine = create_app_engine(os.getenv("DATABASE_URL"), "primary")
+
+# Optional read replica, see `RoutingSession`
+replica_engine = None
+if os.getenv("REPLICA_DATABASE_URL"):
+    replica_engine = create_app_engine(os.getenv("REPLICA_DATABASE_URL"), "replica")
+replica_monitor = ReplicaLagMonitor(replica_engine)
+
+
+class RoutingSession(Session):
+    """
+    Session that reads from the replica during read-only requests.
+
+    Writes, and every statement after the first write of a session, go to the
+    primary. The replica is chosen once per session and only while the lag
+    monitor finds it up to date.
+
+    Statements with the `read_primary` execution option always go to the
+    primary. Data kept in caches shared across requests is loaded that way, so
+    a lagging replica can never put outdated rows into them.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if replica_engine is None:
+            return engine
+        if clause is not None and clause.get_execution_options().get("read_primary"):
+            return engine
+        if self._flushing or isinstance(clause, (Insert, Update, Delete)):
+            self.info["read_replica"] = False
+            return engine
+
+        if "read_replica" not in self.info:
+            self.info["read_replica"] = (
+                reads_from_replica(current_scope()) and replica_monitor.healthy()
+            )
+        return replica_engine if self.info["read_replica"] else engine
+
+
+SessionLocal = sessionmaker(
+    class_=RoutingSession, autocommit=False, autoflush=False, bind=engine
+)
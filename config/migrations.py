@@ -0,0 +1,40 @@
+import os
+
+from sqlalchemy.engine import Engine
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def get_head_revisions() -> set[str]:
+    """
+    Reads the head revisions from the Alembic scripts without touching the database.
+    """
+    # Alembic is imported here to keep it off the worker import path
+    from alembic.config import Config
+    from alembic.script import ScriptDirectory
+
+    config = Config(os.path.join(PROJECT_ROOT, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(PROJECT_ROOT, "alembic"))
+    return set(ScriptDirectory.from_config(config).get_heads())
+
+
+def get_current_revisions(engine: Engine) -> set[str]:
+    """
+    Reads the revisions stamped in the database's `alembic_version` table.
+    """
+    from alembic.runtime.migration import MigrationContext
+
+    with engine.connect() as connection:
+        return set(MigrationContext.configure(connection).get_current_heads())
+
+
+def is_schema_up_to_date(engine: Engine) -> bool:
+    """
+    Checks that the database is stamped with exactly the head revisions.
+
+    A database stamped with only some of the heads, or with an older revision,
+    still has migrations to run. This is a single-row query, unlike
+    `create_all`, which inspects every table.
+    """
+
+    return get_current_revisions(engine) == get_head_revisions()
@@ -0,0 +1,79 @@
+import math
+import os
+
+import uvicorn
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def get_server_settings() -> dict:
+    """
+    Reads the production uvicorn options from the environment.
+    """
+
+    return {
+        "host": os.getenv("HOST", "0.0.0.0"),
+        "port": int(os.getenv("PORT", "8000")),
+        "workers": int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1))),
+        "loop": os.getenv("UVICORN_LOOP", "uvloop"),
+        "http": os.getenv("UVICORN_HTTP", "httptools"),
+        "timeout_keep_alive": int(os.getenv("KEEP_ALIVE", "5")),
+        "backlog": int(os.getenv("BACKLOG", "2048")),
+        "timeout_graceful_shutdown": int(os.getenv("GRACEFUL_TIMEOUT", "30")),
+        "proxy_headers": True,
+        "access_log": os.getenv("ACCESS_LOG", "false").lower() == "true",
+    }
+
+
+def apply_pool_budget(workers: int) -> None:
+    """
+    Splits the database connection budget between the worker processes.
+
+    `DB_MAX_CONNECTIONS` is the number of connections the whole server may
+    hold. Every worker gets an equal share, three quarters of it as permanent
+    pool connections and the rest as overflow. Explicit `DB_POOL_SIZE` and
+    `DB_MAX_OVERFLOW` settings are left untouched. The values are exported to
+    the environment, which the workers inherit when they import `config.db`.
+    """
+
+    budget = int(os.getenv("DB_MAX_CONNECTIONS", "100"))
+    per_worker = max(budget // workers, 1)
+    pool_size = max(math.ceil(per_worker * 0.75), 1)
+
+    os.environ.setdefault("DB_POOL_SIZE", str(pool_size))
+    os.environ.setdefault("DB_MAX_OVERFLOW", str(per_worker - pool_size))
+
+
+def apply_cache_backend(workers: int) -> None:
+    """
+    Makes sure cache invalidations reach every worker process.
+
+    The `memory` backend only invalidates the worker that handled a write, so
+    with several workers the `file` backend becomes the default, and an explicit
+    `memory` setting is refused.
+    """
+
+    if workers <= 1:
+        return
+
+    backend = os.environ.setdefault("CACHE_BACKEND", "file")
+    if backend == "memory":
+        raise SystemExit(
+            f"CACHE_BACKEND=memory only works with one worker, not {workers}; "
+            "use CACHE_BACKEND=file or set WEB_CONCURRENCY=1"
+        )
+
+
+def run_production() -> None:
+    settings = get_server_settings()
+    apply_pool_budget(settings["workers"])
+    apply_cache_backend(settings["workers"])
+
+    print(
+        f"Starting {settings['workers']} workers ({settings['loop']}, {settings['http']}) "
+        f"with pool size {os.environ['DB_POOL_SIZE']} "
+        f"and overflow {os.environ['DB_MAX_OVERFLOW']} per worker, "
+        f"cache backend {os.getenv('CACHE_BACKEND', 'memory')}"
+    )
+    uvicorn.run("app:app", **settings)
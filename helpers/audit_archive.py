@@ -0,0 +1,231 @@
+import fcntl
+import gzip
+import json
+import os
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Iterator
+
+from dotenv import load_dotenv
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from models import models
+
+load_dotenv()
+
+AUDIT_ARCHIVE_DIR = os.getenv("AUDIT_ARCHIVE_DIR", "archive/audit")
+# Rows fetched per round trip from the server-side cursor
+AUDIT_ARCHIVE_BATCH_SIZE = int(os.getenv("AUDIT_ARCHIVE_BATCH_SIZE", "5000"))
+# Rows per segment file, so one search never decompresses more than needed
+AUDIT_ARCHIVE_SEGMENT_ROWS = int(os.getenv("AUDIT_ARCHIVE_SEGMENT_ROWS", "100000"))
+
+INDEX_FILE = "index.json"
+LOCK_FILE = ".lock"
+COLUMNS = ("id", "url", "headers", "method", "request", "response", "timestamp")
+
+
+def _naive_utc(value: datetime | None) -> datetime | None:
+    """
+    Converts an aware datetime, e.g. parsed from `...Z`, to the naive UTC
+    datetimes the audit entries are stored with.
+    """
+
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+class _SegmentWriter:
+    """
+    Gzipped JSONL file that collects the rows of one month.
+    """
+
+    def __init__(self, directory: str, month: str, first_id: int):
+        self.name = f"{month}/audit-{month}-{first_id:012d}.jsonl.gz"
+        self.path = os.path.join(directory, self.name)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.temp_path = f"{self.path}.tmp"
+        self.file = gzip.open(self.temp_path, "wt", encoding="utf-8")
+        self.month = month
+        self.first_id = first_id
+        self.last_id = first_id
+        self.first_time = None
+        self.last_time = None
+        self.rows = 0
+
+    def write(self, row: dict) -> None:
+        self.file.write(json.dumps(row, default=str) + "\n")
+        self.last_id = row["id"]
+        timestamp = row["timestamp"]
+        if self.first_time is None or timestamp < self.first_time:
+            self.first_time = timestamp
+        if self.last_time is None or timestamp > self.last_time:
+            self.last_time = timestamp
+        self.rows += 1
+
+    def close(self) -> dict:
+        self.file.close()
+        os.replace(self.temp_path, self.path)
+        return {
+            "segment": self.name,
+            "month": self.month,
+            "first_id": self.first_id,
+            "last_id": self.last_id,
+            "first_time": self.first_time.isoformat(),
+            "last_time": self.last_time.isoformat(),
+            "rows": self.rows,
+            "bytes": os.path.getsize(self.path),
+        }
+
+    def discard(self) -> None:
+        self.file.close()
+        os.remove(self.temp_path)
+
+
+class AuditArchive:
+    """
+    Compressed, month-partitioned copy of old audit entries.
+
+    Rows are appended in primary-key order to gzipped JSONL segments under
+    `<directory>/<YYYY-MM>/`. `index.json` records the id and time range of
+    every segment, so searches only open the segments that can match and a new
+    run resumes after the last archived id.
+    """
+
+    def __init__(self, directory: str = AUDIT_ARCHIVE_DIR):
+        self.directory = directory
+
+    def _index_path(self) -> str:
+        return os.path.join(self.directory, INDEX_FILE)
+
+    @contextmanager
+    def _locked(self):
+        # Held by one archiving run at a time across workers and the CLI
+        os.makedirs(self.directory, exist_ok=True)
+        lock_fd = os.open(
+            os.path.join(self.directory, LOCK_FILE), os.O_RDWR | os.O_CREAT, 0o644
+        )
+        try:
+            fcntl.flock(lock_fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(lock_fd)
+
+    def segments(self) -> list[dict]:
+        try:
+            with open(self._index_path(), encoding="utf-8") as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return []
+
+    def _save_index(self, segments: list[dict]) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        temp_path = f"{self._index_path()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(segments, file, indent=1)
+        os.replace(temp_path, self._index_path())
+
+    def last_archived_id(self) -> int:
+        return max((segment["last_id"] for segment in self.segments()), default=0)
+
+    def archive(
+        self,
+        db: Session,
+        before: datetime,
+        batch_size: int = AUDIT_ARCHIVE_BATCH_SIZE,
+        segment_rows: int = AUDIT_ARCHIVE_SEGMENT_ROWS,
+    ) -> list[dict]:
+        """
+        Streams every entry older than `before` that is not archived yet into
+        new segments. The rows come from a server-side cursor, so memory use
+        does not depend on the size of the table.
+
+        :return: Index entries of the segments that were written
+        """
+
+        audit = models.Audit.__table__
+
+        # The resume point is read and the index written under one lock, so
+        # concurrent runs never archive the same rows or drop each other's segments
+        with self._locked():
+            statement = (
+                select(*(audit.c[column] for column in COLUMNS))
+                .where(audit.c.id > self.last_archived_id())
+                .where(audit.c.timestamp < _naive_utc(before))
+                .order_by(audit.c.id)
+                .execution_options(stream_results=True, yield_per=batch_size)
+            )
+            writers: dict[str, _SegmentWriter] = {}
+            written = []
+            try:
+                for row in db.execute(statement).mappings():
+                    month = row["timestamp"].strftime("%Y-%m")
+                    writer = writers.get(month)
+                    if writer is None:
+                        writer = writers[month] = _SegmentWriter(
+                            self.directory, month, row["id"]
+                        )
+                    writer.write(dict(row))
+                    if writer.rows >= segment_rows:
+                        written.append(writers.pop(month).close())
+                written.extend(writer.close() for writer in writers.values())
+            except Exception:
+                for writer in writers.values():
+                    writer.discard()
+                raise
+
+            if written:
+                self._save_index(self.segments() + written)
+        return written
+
+    def segment_path(self, name: str) -> str | None:
+        """
+        Resolves an indexed segment name to its file, or None if it is unknown.
+        """
+
+        if name not in {segment["segment"] for segment in self.segments()}:
+            return None
+        return os.path.join(self.directory, name)
+
+    def search(
+        self,
+        start: datetime | None = None,
+        end: datetime | None = None,
+        query: str = "",
+        limit: int | None = None,
+    ) -> Iterator[str]:
+        """
+        Yields the archived entries, as JSON lines, logged between `start` and
+        `end` whose url, user or request contains `query`. Segments outside the
+        time range are skipped using the index.
+        """
+
+        start, end = _naive_utc(start), _naive_utc(end)
+        found = 0
+        for segment in self.segments():
+            if start and datetime.fromisoformat(segment["last_time"]) < start:
+                continue
+            if end and datetime.fromisoformat(segment["first_time"]) >= end:
+                continue
+
+            path = os.path.join(self.directory, segment["segment"])
+            with gzip.open(path, "rt", encoding="utf-8") as file:
+                for line in file:
+                    entry = json.loads(line)
+                    if query and not any(
+                        query in (entry[field] or "")
+                        for field in ("url", "headers", "request")
+                    ):
+                        continue
+                    timestamp = datetime.fromisoformat(entry["timestamp"])
+                    if (start and timestamp < start) or (end and timestamp >= end):
+                        continue
+
+                    yield line
+                    found += 1
+                    if limit and found >= limit:
+                        return
+
+
+audit_archive = AuditArchive()
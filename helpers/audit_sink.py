@@ -0,0 +1,349 @@
+import fcntl
+import glob
+import json
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Callable
+
+from dotenv import load_dotenv
+from sqlalchemy import or_, select
+from sqlalchemy.orm import Session
+
+from config.db import SessionLocal
+from helpers import partitions
+from models import models
+
+load_dotenv()
+
+AUDIT_SINK = os.getenv("AUDIT_SINK", "sql")
+AUDIT_LOG_DIR = os.getenv("AUDIT_LOG_DIR", "audit-log")
+AUDIT_LOG_SEGMENT_BYTES = int(os.getenv("AUDIT_LOG_SEGMENT_MB", "64")) * 1024 * 1024
+# Appended entries are fsynced together at most this often
+AUDIT_FSYNC_INTERVAL = int(os.getenv("AUDIT_FSYNC_INTERVAL_MS", "20")) / 1000
+# Entry ids a file sink process takes from the shared sequence at once
+AUDIT_ID_BLOCK_SIZE = 1000
+
+FIELDS = ("id", "url", "headers", "method", "request", "timestamp")
+
+
+class AuditSink(ABC):
+    """
+    Where audit entries are written to and read back from.
+
+    An entry is a dict with the `url`, `headers` (the username), `method` and
+    `request` of one mutating request. The sink assigns its id and timestamp.
+    """
+
+    @abstractmethod
+    def write(self, entry: dict) -> None:
+        ...
+
+    @abstractmethod
+    def read(self, query: str, skip: int, limit: int) -> list[dict]:
+        """
+        Returns entries whose user, request or timestamp contains any of the
+        whitespace-separated terms of `query`, or every entry if it is empty.
+        """
+
+    @abstractmethod
+    def count(self) -> int:
+        ...
+
+    @abstractmethod
+    def purge(
+        self, before: datetime | None, chunk_size: int, pause: float
+    ) -> tuple[list[str], int]:
+        """
+        Removes entries logged before `before`, or every entry if it is None.
+
+        `chunk_size` and `pause` bound how many entries are removed at once
+        and how long to wait in between. Returns the names of the dropped
+        partitions or files and the number of removed entries.
+        """
+
+
+class SqlAuditSink(AuditSink):
+    """
+    Stores entries in the `audit` table of the application database.
+    """
+
+    def __init__(self, session_factory: Callable[[], Session]):
+        self.session_factory = session_factory
+
+    def write(self, entry: dict) -> None:
+        db = self.session_factory()
+        try:
+            db.add(models.Audit(**entry))
+            db.commit()
+        finally:
+            db.close()
+
+    def read(self, query: str, skip: int, limit: int) -> list[dict]:
+        db = self.session_factory()
+        try:
+            log = db.query(models.Audit)
+            if query.split():
+                log = log.filter(
+                    or_(
+                        models.Audit.headers.like(f"%{q}%")
+                        | models.Audit.request.like(f"%{q}%")
+                        | models.Audit.timestamp.like(f"%{q}%")
+                        for q in query.split()
+                    )
+                )
+            return [
+                {column: getattr(entry, column) for column in FIELDS}
+                for entry in log.order_by(models.Audit.id).offset(skip).limit(limit)
+            ]
+        finally:
+            db.close()
+
+    def count(self) -> int:
+        db = self.session_factory()
+        try:
+            return db.query(models.Audit).count()
+        finally:
+            db.close()
+
+    def purge(
+        self, before: datetime | None, chunk_size: int, pause: float
+    ) -> tuple[list[str], int]:
+        """
+        Drops the monthly partitions entirely before the cutoff, which is a
+        metadata change, then deletes the remaining rows in id-ordered chunks,
+        each in its own short transaction, so writers are never blocked for
+        long.
+        """
+
+        db = self.session_factory()
+        try:
+            dropped = []
+            if before is not None:
+                dropped = partitions.drop_partitions_before(
+                    db, models.Audit.__tablename__, before
+                )
+
+            deleted = 0
+            while True:
+                chunk = (
+                    select(models.Audit.id).order_by(models.Audit.id).limit(chunk_size)
+                )
+                if before is not None:
+                    chunk = chunk.where(models.Audit.timestamp < before)
+                ids = db.scalars(chunk).all()
+                if not ids:
+                    break
+
+                deleted += (
+                    db.query(models.Audit)
+                    .filter(models.Audit.id.in_(ids))
+                    .delete(synchronize_session=False)
+                )
+                db.commit()
+                if len(ids) < chunk_size:
+                    break
+                time.sleep(pause)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+        return dropped, deleted
+
+
+class FileAuditSink(AuditSink):
+    """
+    Appends entries as JSON lines to local, size-rotated segment files.
+
+    Each process writes its own segments, named after their creation time and
+    process id, so workers never interleave writes. Entry ids come in blocks
+    from a sequence file shared by all processes, so they never collide.
+    Writers wait until their entry is on disk, but a background thread fsyncs
+    every `fsync_interval` seconds for all entries appended in the meantime,
+    so a burst of requests shares one fsync instead of paying for one each.
+    """
+
+    def __init__(
+        self,
+        directory: str = AUDIT_LOG_DIR,
+        segment_bytes: int = AUDIT_LOG_SEGMENT_BYTES,
+        fsync_interval: float = AUDIT_FSYNC_INTERVAL,
+    ):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.fsync_interval = fsync_interval
+        self._lock = threading.Lock()
+        self._synced = threading.Condition(self._lock)
+        self._file = None
+        self._pid = None
+        self._appended = 0
+        self._flushed = 0
+        self._next_id = 0
+        self._id_block_end = 0
+        # Segment sizes and line counts seen by the last count
+        self._counts: dict[str, tuple[int, int]] = {}
+
+    def _open_segment(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        name = f"audit-{time.strftime('%Y%m%d%H%M%S')}-{os.getpid()}.log"
+        self._file = open(os.path.join(self.directory, name), "ab")
+
+    def _ensure_started(self) -> None:
+        # Segments and the fsync thread belong to the process that writes
+        if self._pid == os.getpid():
+            # The segment was removed by a purge in another process
+            if os.fstat(self._file.fileno()).st_nlink == 0:
+                self._file.close()
+                self._open_segment()
+            return
+        self._pid = os.getpid()
+        self._next_id = self._id_block_end = 0
+        self._open_segment()
+        threading.Thread(target=self._fsync_loop, daemon=True).start()
+
+    def _take_id(self) -> int:
+        if self._next_id >= self._id_block_end:
+            path = os.path.join(self.directory, "ids")
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                start = int(os.read(fd, 32) or 0)
+                os.lseek(fd, 0, os.SEEK_SET)
+                os.ftruncate(fd, 0)
+                os.write(fd, str(start + AUDIT_ID_BLOCK_SIZE).encode())
+            finally:
+                os.close(fd)
+            self._next_id = start + 1
+            self._id_block_end = start + AUDIT_ID_BLOCK_SIZE + 1
+
+        entry_id = self._next_id
+        self._next_id += 1
+        return entry_id
+
+    def _sync(self) -> None:
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._flushed = self._appended
+        self._synced.notify_all()
+
+    def _fsync_loop(self) -> None:
+        while True:
+            time.sleep(self.fsync_interval)
+            with self._lock:
+                if self._flushed < self._appended:
+                    self._sync()
+
+    def write(self, entry: dict) -> None:
+        with self._lock:
+            self._ensure_started()
+            line = json.dumps(
+                {"id": self._take_id(), **entry, "timestamp": datetime.now()},
+                default=str,
+            )
+            self._file.write(line.encode() + b"\n")
+            self._appended += 1
+            sequence = self._appended
+
+            if self._file.tell() >= self.segment_bytes:
+                self._sync()
+                self._file.close()
+                self._open_segment()
+
+            while self._flushed < sequence:
+                self._synced.wait()
+
+    def _segments(self) -> list[str]:
+        with self._lock:
+            # Make entries still buffered by this process visible to the reader
+            if self._file is not None and self._pid == os.getpid():
+                self._file.flush()
+        return sorted(glob.glob(os.path.join(self.directory, "audit-*.log")))
+
+    def read(self, query: str, skip: int, limit: int) -> list[dict]:
+        terms = query.split()
+        entries = []
+        for path in self._segments():
+            with open(path, "rb") as file:
+                for line in file:
+                    # Another worker may be halfway through appending this line
+                    if not line.endswith(b"\n"):
+                        break
+                    entry = json.loads(line)
+                    if terms and not any(
+                        term in entry[field]
+                        for term in terms
+                        for field in ("headers", "request", "timestamp")
+                    ):
+                        continue
+                    if skip:
+                        skip -= 1
+                        continue
+                    entry["timestamp"] = datetime.fromisoformat(entry["timestamp"])
+                    entries.append(entry)
+                    if len(entries) >= limit:
+                        return entries
+        return entries
+
+    def count(self) -> int:
+        total = 0
+        for path in self._segments():
+            size = os.path.getsize(path)
+            counted_size, lines = self._counts.get(path, (None, 0))
+            # Only segments that grew since the last count are read again
+            if counted_size != size:
+                with open(path, "rb") as file:
+                    lines = sum(1 for _ in file)
+                self._counts[path] = (size, lines)
+            total += lines
+        return total
+
+    def purge(
+        self, before: datetime | None, chunk_size: int, pause: float
+    ) -> tuple[list[str], int]:
+        """
+        Removes whole segments whose newest entry is older than the cutoff.
+
+        A segment that spans the cutoff is kept until all of its entries are
+        old enough. Writers notice that their segment was removed and start a
+        new one. `chunk_size` and `pause` are not needed for removing files.
+        """
+
+        removed, deleted = [], 0
+        for path in self._segments():
+            lines, newest = 0, None
+            with open(path, "rb") as file:
+                for line in file:
+                    if line.endswith(b"\n"):
+                        lines += 1
+                        newest = json.loads(line)["timestamp"]
+            if before is not None and (
+                newest is None or datetime.fromisoformat(newest) >= before
+            ):
+                continue
+
+            os.remove(path)
+            self._counts.pop(path, None)
+            removed.append(os.path.basename(path))
+            deleted += lines
+
+        return removed, deleted
+
+
+def create_audit_sink() -> AuditSink:
+    """
+    Creates the audit sink selected by the `AUDIT_SINK` setting.
+    """
+
+    if AUDIT_SINK == "file":
+        return FileAuditSink()
+    if AUDIT_SINK != "sql":
+        raise ValueError(f"Unknown AUDIT_SINK: {AUDIT_SINK}")
+
+    return SqlAuditSink(SessionLocal)
+
+
+audit_sink = create_audit_sink()
@@ -0,0 +1,249 @@
+import fcntl
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Hashable
+
+
+class MemoryCacheBackend:
+    """
+    Keeps invalidation generations in this process only.
+
+    Generations start at a random value, so tokens built from them never repeat
+    across restarts.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._base = random.getrandbits(32)
+        self._epoch = f"{random.getrandbits(32):08x}"
+        self._generations: dict[str, int] = {}
+        self._pins: dict[str, float] = {}
+
+    def get_epoch(self) -> str:
+        return self._epoch
+
+    def get_generation(self, namespace: str) -> int:
+        return self._generations.get(namespace, self._base)
+
+    def bump_generation(self, namespace: str) -> int:
+        with self._lock:
+            generation = self._generations.get(namespace, self._base) + 1
+            self._generations[namespace] = generation
+        return generation
+
+    def pin(self, key: str, seconds: float) -> None:
+        now = time.time()
+        with self._lock:
+            # Forget pins that ran out, so the map stays small
+            for expired in [k for k, until in self._pins.items() if until <= now]:
+                del self._pins[expired]
+            self._pins[key] = now + seconds
+
+    def is_pinned(self, key: str) -> bool:
+        return self._pins.get(key, 0) > time.time()
+
+
+class FileCacheBackend:
+    """
+    Keeps invalidation generations in a directory shared by every worker.
+
+    This is the local stand-in for a shared cache server: every worker on the
+    host reads the same counters, so a write handled by one worker invalidates
+    the caches of all of them.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._pruned = time.time()
+
+    def _path(self, namespace: str) -> str:
+        return os.path.join(self.directory, f"{namespace}.generation")
+
+    def get_epoch(self) -> str:
+        """
+        Identifies the current set of counters.
+
+        Counters restart at 0 when the directory is wiped. The epoch file goes
+        with them and is recreated with a new random id, so tokens built from
+        the counters never repeat.
+        """
+
+        path = os.path.join(self.directory, "epoch")
+        try:
+            with open(path, "rb") as file:
+                return file.read().decode()
+        except FileNotFoundError:
+            pass
+
+        os.makedirs(self.directory, exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as file:
+            file.write(f"{random.getrandbits(32):08x}".encode())
+        try:
+            # Only the first process to get here publishes its epoch
+            os.link(temp_path, path)
+        except FileExistsError:
+            pass
+        finally:
+            os.remove(temp_path)
+        with open(path, "rb") as file:
+            return file.read().decode()
+
+    def get_generation(self, namespace: str) -> int:
+        try:
+            with open(self._path(namespace), "rb") as file:
+                return int(file.read() or 0)
+        except FileNotFoundError:
+            return 0
+
+    def bump_generation(self, namespace: str) -> int:
+        path = self._path(namespace)
+        # The directory may have been wiped, e.g. by a /tmp cleaner
+        os.makedirs(self.directory, exist_ok=True)
+        lock_fd = os.open(f"{path}.lock", os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(lock_fd, fcntl.LOCK_EX)
+            generation = self.get_generation(namespace) + 1
+            # Replace the file atomically so readers never see a partial write
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            with open(temp_path, "wb") as file:
+                file.write(str(generation).encode())
+            os.replace(temp_path, path)
+        finally:
+            os.close(lock_fd)
+        return generation
+
+    def _pin_path(self, key: str) -> str:
+        return os.path.join(self.directory, "pins", key)
+
+    def pin(self, key: str, seconds: float) -> None:
+        """
+        Marks `key` for the next `seconds` in every process on the host.
+        """
+
+        now = time.time()
+        path = self._pin_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as file:
+            file.write(str(now + seconds).encode())
+        os.replace(temp_path, path)
+
+        # Remove pins that ran out once in a while, so the directory stays small
+        if now - self._pruned > seconds:
+            self._pruned = now
+            for name in os.listdir(os.path.dirname(path)):
+                if not name.endswith(".tmp") and not self.is_pinned(name):
+                    try:
+                        os.remove(self._pin_path(name))
+                    except FileNotFoundError:
+                        pass
+
+    def is_pinned(self, key: str) -> bool:
+        try:
+            with open(self._pin_path(key), "rb") as file:
+                return float(file.read() or 0) > time.time()
+        except (FileNotFoundError, ValueError):
+            return False
+
+
+def create_cache_backend() -> MemoryCacheBackend | FileCacheBackend:
+    """
+    Creates the invalidation backend selected by the `CACHE_BACKEND` setting.
+    """
+
+    backend = os.getenv("CACHE_BACKEND", "memory")
+    if backend == "file":
+        return FileCacheBackend(os.getenv("CACHE_DIR", "/tmp/b7-locator-cache"))
+    if backend != "memory":
+        raise ValueError(f"Unknown CACHE_BACKEND: {backend}")
+    return MemoryCacheBackend()
+
+
+cache_backend = create_cache_backend()
+
+
+class TTLCache:
+    """
+    Read-through cache of loaded values with a time to live.
+
+    Entries are kept in this process. `invalidate` bumps the namespace
+    generation on the shared backend, and every process drops its entries as
+    soon as it sees a newer generation.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        ttl: float,
+        max_entries: int = 10_000,
+        backend: MemoryCacheBackend | FileCacheBackend | None = None,
+    ):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.backend = backend or cache_backend
+        self._lock = threading.Lock()
+        self._entries: dict[Hashable, tuple[Any, float]] = {}
+        self._generation = self.backend.get_generation(namespace)
+        self._stats = {"hits": 0, "misses": 0, "expired": 0, "invalidations": 0}
+
+    def _sync_generation(self) -> int:
+        generation = self.backend.get_generation(self.namespace)
+        if generation != self._generation:
+            self._entries.clear()
+            self._generation = generation
+            self._stats["invalidations"] += 1
+        return generation
+
+    def get(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """
+        Returns the cached value of `key`, calling `loader` on a miss.
+
+        A loader result of None is returned but not cached.
+        """
+
+        with self._lock:
+            generation = self._sync_generation()
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > time.monotonic():
+                    self._stats["hits"] += 1
+                    return value
+                del self._entries[key]
+                self._stats["expired"] += 1
+            self._stats["misses"] += 1
+
+        value = loader()
+
+        with self._lock:
+            # Skip storing a value that raced with an invalidation
+            if value is not None and self._sync_generation() == generation:
+                if len(self._entries) >= self.max_entries:
+                    self._entries.pop(next(iter(self._entries)))
+                self._entries[key] = (value, time.monotonic() + self.ttl)
+
+        return value
+
+    def invalidate(self) -> None:
+        """
+        Drops every entry of the namespace in all processes.
+        """
+
+        self.backend.bump_generation(self.namespace)
+        with self._lock:
+            self._sync_generation()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "namespace": self.namespace,
+                "ttl": self.ttl,
+                "size": len(self._entries),
+                "generation": self._generation,
+                **self._stats,
+            }
@@ -0,0 +1,302 @@
+import contextvars
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+from starlette.datastructures import MutableHeaders
+
+from helpers.metrics import DB_POOL_TIMEOUTS, DB_POOL_WAIT, PoolStats
+
+REQUEST_TIMING = os.getenv("REQUEST_TIMING", "true").lower() == "true"
+REQUEST_LOG = os.getenv("REQUEST_LOG", "true").lower() == "true"
+# Development and test mode: flags N+1 patterns and checks query budgets
+QUERY_DEBUG = os.getenv("QUERY_DEBUG", "false").lower() == "true"
+QUERY_BUDGET_STRICT = os.getenv("QUERY_BUDGET_STRICT", "false").lower() == "true"
+# Repeats of one statement with different parameters reported as N+1
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "3"))
+
+logger = logging.getLogger("b7.requests")
+if not logger.handlers:
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+class RequestTimings:
+    """
+    Time spent by one request, filled in while the request is handled.
+    """
+
+    __slots__ = ("sql_count", "sql_ms", "pool_wait_ms", "phases", "statements")
+
+    def __init__(self, track_statements: bool = False):
+        self.sql_count = 0
+        self.sql_ms = 0.0
+        self.pool_wait_ms = 0.0
+        self.phases: dict[str, float] = {}
+        # Statement text mapped to its execution count and distinct parameters
+        self.statements: dict[str, list] | None = {} if track_statements else None
+
+    def n_plus_one_statements(self) -> list[str]:
+        """
+        Statements run repeatedly with different parameters, typically lazy
+        loads of a relationship inside a loop.
+        """
+
+        return [
+            statement
+            for statement, (count, parameters) in self.statements.items()
+            if count >= N_PLUS_ONE_THRESHOLD and len(parameters) > 1
+        ]
+
+    def server_timing(self, total_ms: float) -> str:
+        metrics = [
+            f'db;dur={self.sql_ms:.1f};desc="{self.sql_count} queries"',
+            f"pool;dur={self.pool_wait_ms:.1f}",
+        ]
+        metrics += [f"{phase};dur={ms:.1f}" for phase, ms in self.phases.items()]
+        metrics.append(f"app;dur={total_ms:.1f}")
+        return ", ".join(metrics)
+
+
+_current_timings: contextvars.ContextVar[
+    RequestTimings | None
+] = contextvars.ContextVar("request_timings", default=None)
+
+
+_current_scope: contextvars.ContextVar[dict | None] = contextvars.ContextVar(
+    "request_scope", default=None
+)
+
+
+def current_timings() -> RequestTimings | None:
+    return _current_timings.get()
+
+
+def current_scope() -> dict | None:
+    """
+    ASGI scope of the request being handled, None outside of requests.
+    """
+
+    return _current_scope.get()
+
+
+def current_route() -> str | None:
+    """
+    Describes the request being handled, e.g. `GET /retained/{id}`.
+    """
+
+    scope = _current_scope.get()
+    if scope is None:
+        return None
+    route = scope.get("route")
+    return f"{scope['method']} {route.path if route is not None else scope['path']}"
+
+
+@contextmanager
+def measure(phase: str):
+    """
+    Adds the time spent in the block to a named phase of the current request.
+    """
+
+    timings = _current_timings.get()
+    if timings is None:
+        yield
+        return
+
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = (time.perf_counter() - started) * 1000
+        timings.phases[phase] = timings.phases.get(phase, 0.0) + elapsed
+
+
+class TimedQueuePool(QueuePool):
+    """
+    Queue pool that records how long a request waited for a connection.
+    """
+
+    def __init__(self, *args, **kw):
+        super().__init__(*args, **kw)
+        self.stats = PoolStats()
+
+    def recreate(self):
+        # Keep the statistics when the engine replaces its pool on dispose
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+    def max_overflow(self) -> int:
+        return self._max_overflow
+
+    def _do_get(self):
+        started = time.perf_counter()
+        timed_out = False
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            timed_out = True
+            DB_POOL_TIMEOUTS.inc()
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            DB_POOL_WAIT.observe(waited)
+            self.stats.waited(waited, timed_out)
+            timings = _current_timings.get()
+            if timings is not None:
+                timings.pool_wait_ms += waited * 1000
+
+
+def install_engine_hooks(engine: Engine) -> None:
+    """
+    Counts and times every statement executed for the current request.
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(
+        conn, cursor, statement, parameters, context, executemany
+    ):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = (time.perf_counter() - conn.info["query_started"].pop()) * 1000
+        timings = _current_timings.get()
+        if timings is not None:
+            timings.sql_count += 1
+            timings.sql_ms += elapsed
+            if timings.statements is not None:
+                seen = timings.statements.setdefault(statement, [0, set()])
+                seen[0] += 1
+                seen[1].add(repr(parameters))
+
+
+def query_budget(max_queries: int):
+    """
+    Declares the most statements a route may run, authentication included.
+
+    Checked in `QUERY_DEBUG` mode. Place it below the router decorator:
+
+        @router.get("/")
+        @query_budget(2)
+        def handler(): ...
+    """
+
+    def decorator(endpoint):
+        endpoint.__query_budget__ = max_queries
+        return endpoint
+
+    return decorator
+
+
+def check_queries(scope, timings: RequestTimings) -> list[str]:
+    """
+    Lists the N+1 patterns and budget overruns of a finished request.
+    """
+
+    problems = [
+        f"N+1 pattern: {' '.join(statement.split())}"
+        for statement in timings.n_plus_one_statements()
+    ]
+    budget = getattr(scope.get("endpoint"), "__query_budget__", None)
+    if budget is not None and timings.sql_count > budget:
+        problems.append(
+            f"Query budget exceeded: {timings.sql_count} statements, budget {budget}"
+        )
+    return problems
+
+
+class RequestTimingMiddleware:
+    """
+    Adds a `Server-Timing` header and a JSON log line to every response.
+
+    The header reports the SQL statement count and time, the connection pool
+    wait, named phases such as `auth` and `audit`, and the total handler time.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        _current_scope.set(scope)
+        if not REQUEST_TIMING and not QUERY_DEBUG:
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings(track_statements=QUERY_DEBUG)
+        token = _current_timings.set(timings)
+        started = time.perf_counter()
+        response = {"status": 500, "total_ms": 0.0, "replaced": False}
+
+        async def send_with_timing(message):
+            if response["replaced"]:
+                return
+
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["total_ms"] = (time.perf_counter() - started) * 1000
+                problems = check_queries(scope, timings) if QUERY_DEBUG else []
+                for problem in problems:
+                    logger.warning(f"{current_route()}: {problem}")
+
+                if problems and QUERY_BUDGET_STRICT:
+                    # Fail the request, so tests hitting the route fail as well
+                    response["replaced"] = True
+                    response["status"] = 500
+                    body = json.dumps({"detail": problems}).encode()
+                    await send(
+                        {
+                            "type": "http.response.start",
+                            "status": 500,
+                            "headers": [
+                                (b"content-type", b"application/json"),
+                                (b"content-length", str(len(body)).encode()),
+                            ],
+                        }
+                    )
+                    await send({"type": "http.response.body", "body": body})
+                    return
+
+                headers = MutableHeaders(scope=message)
+                if problems:
+                    headers.append("X-Query-Warnings", str(len(problems)))
+                if REQUEST_TIMING:
+                    headers.append(
+                        "Server-Timing", timings.server_timing(response["total_ms"])
+                    )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_timings.reset(token)
+            if REQUEST_TIMING and REQUEST_LOG:
+                logger.info(
+                    json.dumps(
+                        {
+                            "method": scope["method"],
+                            "path": scope["path"],
+                            "status": response["status"],
+                            "total_ms": round(response["total_ms"], 2),
+                            "sql_count": timings.sql_count,
+                            "sql_ms": round(timings.sql_ms, 2),
+                            "pool_wait_ms": round(timings.pool_wait_ms, 2),
+                            **{
+                                f"{phase}_ms": round(ms, 2)
+                                for phase, ms in timings.phases.items()
+                            },
+                        }
+                    )
+                )
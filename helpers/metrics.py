@@ -0,0 +1,338 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class _Metric:
+    """
+    Base of the Prometheus metric types.
+
+    Every thread writes to its own shard without taking a lock; the shards are
+    only merged when the metrics are scraped. The lock is taken once per thread
+    to register its shard.
+    """
+
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labels: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._local = threading.local()
+        self._shards: list[dict] = []
+        self._lock = threading.Lock()
+        registry.append(self)
+
+    def _shard(self) -> dict:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = {}
+            with self._lock:
+                self._shards.append(shard)
+            self._local.shard = shard
+        return shard
+
+    def _merged(self) -> dict:
+        with self._lock:
+            shards = list(self._shards)
+        merged = {}
+        for shard in shards:
+            # dict.copy is atomic, so a concurrent writer cannot break the merge
+            for labels, value in shard.copy().items():
+                merged[labels] = self._combine(merged.get(labels), value)
+        return merged
+
+    def _combine(self, total, value):
+        return (total or 0) + value
+
+    def _format_labels(self, values: tuple, extra: str = "") -> str:
+        pairs = [f'{name}="{value}"' for name, value in zip(self.labels, values)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self) -> list[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type}",
+        ]
+        for labels, value in sorted(self._merged().items()):
+            lines += self._render_sample(labels, value)
+        return lines
+
+    def _render_sample(self, labels: tuple, value) -> list[str]:
+        return [f"{self.name}{self._format_labels(labels)} {value}"]
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0) + amount
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def dec(self, *labels, amount: float = 1) -> None:
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: tuple = (),
+        buckets: tuple = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labels)
+        self.buckets = buckets
+
+    def observe(self, seconds: float, *labels) -> None:
+        shard = self._shard()
+        state = shard.get(labels)
+        if state is None:
+            # Per-bucket counts, then the sum and count of all observations
+            state = shard[labels] = [0] * (len(self.buckets) + 3)
+        state[bisect.bisect_left(self.buckets, seconds)] += 1
+        state[-2] += seconds
+        state[-1] += 1
+
+    @contextmanager
+    def time(self, *labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def _combine(self, total, value):
+        if total is None:
+            return list(value)
+        return [left + right for left, right in zip(total, value)]
+
+    def _render_sample(self, labels: tuple, value) -> list[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + ("+Inf",), value):
+            cumulative += count
+            bucket_labels = self._format_labels(labels, f'le="{bound}"')
+            lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+        lines.append(f"{self.name}_sum{self._format_labels(labels)} {value[-2]}")
+        lines.append(f"{self.name}_count{self._format_labels(labels)} {value[-1]}")
+        return lines
+
+
+registry: list[_Metric] = []
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Time spent handling a request.",
+    ("method", "route", "status"),
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight", "Requests currently being handled.", ("method",)
+)
+DB_POOL_CHECKOUTS = Counter(
+    "db_pool_checkouts_total", "Connections checked out of the pool."
+)
+DB_POOL_TIMEOUTS = Counter(
+    "db_pool_timeouts_total", "Checkouts that gave up waiting for a connection."
+)
+DB_POOL_INVALIDATIONS = Counter(
+    "db_pool_invalidations_total",
+    "Pooled connections discarded as broken, e.g. by the pre-ping.",
+)
+DB_POOL_WAIT = Histogram(
+    "db_pool_wait_seconds",
+    "Time spent waiting for a pooled connection.",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30),
+)
+AUDIT_WRITE_LATENCY = Histogram(
+    "audit_write_duration_seconds", "Time spent storing an audit entry."
+)
+REPORT_RENDER_DURATION = Histogram(
+    "report_render_duration_seconds",
+    "Time spent rendering a destroy report PDF.",
+    ("sample_type",),
+)
+
+
+class PoolStats:
+    """
+    Checkout statistics of one connection pool in this worker.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.invalidations = 0
+        self.waits = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        # When each connection currently in use was checked out
+        self._checked_out: dict[int, float] = {}
+
+    def waited(self, seconds: float, timed_out: bool) -> None:
+        with self._lock:
+            self.waits += 1
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+            if timed_out:
+                self.timeouts += 1
+
+    def checked_out(self, connection_record) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self._checked_out[id(connection_record)] = time.monotonic()
+
+    def checked_in(self, connection_record) -> None:
+        with self._lock:
+            self._checked_out.pop(id(connection_record), None)
+
+    def invalidated(self) -> None:
+        with self._lock:
+            self.invalidations += 1
+
+    def snapshot(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            held = [now - started for started in self._checked_out.values()]
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "invalidations": self.invalidations,
+                "wait_avg_ms": round(
+                    self.wait_seconds_total / self.waits * 1000 if self.waits else 0, 2
+                ),
+                "wait_max_ms": round(self.wait_seconds_max * 1000, 2),
+                "longest_checkout_ms": round(max(held, default=0) * 1000, 2),
+            }
+
+
+pool_metrics = []
+
+
+def install_pool_metrics(engine: Engine, name: str = "primary") -> None:
+    """
+    Counts pool checkouts and exposes the live pool state at scrape time,
+    labelled with the database the pool connects to. The pool has to keep a
+    `PoolStats` in its `stats` attribute.
+    """
+
+    @event.listens_for(engine, "checkout")
+    def checkout(dbapi_connection, connection_record, connection_proxy):
+        DB_POOL_CHECKOUTS.inc()
+        engine.pool.stats.checked_out(connection_record)
+
+    @event.listens_for(engine, "checkin")
+    def checkin(dbapi_connection, connection_record):
+        engine.pool.stats.checked_in(connection_record)
+
+    @event.listens_for(engine, "invalidate")
+    def invalidate(dbapi_connection, connection_record, exception):
+        DB_POOL_INVALIDATIONS.inc()
+        engine.pool.stats.invalidated()
+
+    # The engine rather than its pool, which is replaced when the engine is disposed
+    pool_metrics.append((name, engine))
+
+
+def pool_status() -> list[dict]:
+    """
+    Describes the live state and checkout statistics of every pool.
+    """
+
+    status = []
+    for database, engine in pool_metrics:
+        pool = engine.pool
+        capacity = pool.size() + pool.max_overflow()
+        status.append(
+            {
+                "database": database,
+                "driver": engine.url.drivername,
+                "size": pool.size(),
+                "capacity": capacity,
+                "checked_in": pool.checkedin(),
+                "checked_out": pool.checkedout(),
+                "overflow": max(pool.overflow(), 0),
+                "available": capacity - pool.checkedout(),
+                **pool.stats.snapshot(),
+            }
+        )
+    return status
+
+
+def render_pool_state() -> list[str]:
+    lines = []
+    gauges = (
+        ("db_pool_size", "Permanent connections of the pool.", "size"),
+        ("db_pool_checked_out", "Connections currently in use.", "checkedout"),
+        ("db_pool_overflow", "Connections opened beyond the pool size.", "overflow"),
+    )
+    for name, documentation, method in gauges:
+        lines += [f"# HELP {name} {documentation}", f"# TYPE {name} gauge"]
+        for database, engine in pool_metrics:
+            # The pool reports unopened slots as negative overflow
+            value = max(getattr(engine.pool, method)(), 0)
+            lines.append(f'{name}{{database="{database}"}} {value}')
+    return lines
+
+
+def render_metrics() -> str:
+    """
+    Renders every metric in the Prometheus text exposition format.
+    """
+
+    lines = []
+    for metric in registry:
+        lines += metric.render()
+    lines += render_pool_state()
+    return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """
+    Records the latency of every request by method, route template and status.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        response = {"status": 500}
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc(method)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            REQUESTS_IN_FLIGHT.dec(method)
+            route = scope.get("route")
+            REQUEST_LATENCY.observe(
+                time.perf_counter() - started,
+                method,
+                route.path if route is not None else "unmatched",
+                str(response["status"]),
+            )
@@ -0,0 +1,133 @@
+from collections import namedtuple
+from datetime import date, datetime
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+# Catch-all partition kept last so inserts never fail for a missing month
+MAX_PARTITION = "pmax"
+
+Partition = namedtuple("Partition", ["name", "upper_bound"])
+
+
+def supports_partitions(db: Session) -> bool:
+    """
+    Partition maintenance only applies to MySQL; other databases keep plain tables.
+    """
+
+    return db.get_bind().dialect.name == "mysql"
+
+
+def month_start(day: date) -> date:
+    return date(day.year, day.month, 1)
+
+
+def next_month(day: date) -> date:
+    if day.month == 12:
+        return date(day.year + 1, 1, 1)
+    return date(day.year, day.month + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    """
+    Name of the partition holding the rows of the given month, e.g. `p202403`.
+    """
+
+    return f"p{month.year}{month.month:02d}"
+
+
+def monthly_partition_definitions(start: date, end: date) -> list[str]:
+    """
+    Builds one `PARTITION ... VALUES LESS THAN` clause per month from `start` up to
+    and including the month of `end`.
+    """
+
+    definitions = []
+    month = month_start(start)
+    while month <= end:
+        upper = next_month(month)
+        definitions.append(
+            f"PARTITION {partition_name(month)} VALUES LESS THAN ('{upper.isoformat()}')"
+        )
+        month = upper
+    return definitions
+
+
+def list_partitions(db: Session, table: str) -> list[Partition]:
+    """
+    Lists the range partitions of a table in order, with the exclusive upper bound
+    of each one (None for the catch-all partition).
+    """
+
+    if not supports_partitions(db):
+        return []
+
+    rows = db.execute(
+        text(
+            "SELECT PARTITION_NAME, PARTITION_DESCRIPTION "
+            "FROM information_schema.PARTITIONS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table "
+            "AND PARTITION_NAME IS NOT NULL "
+            "ORDER BY PARTITION_ORDINAL_POSITION"
+        ),
+        {"table": table},
+    ).all()
+
+    partitions = []
+    for name, description in rows:
+        upper_bound = None
+        if description and description != "MAXVALUE":
+            upper_bound = datetime.fromisoformat(description.strip("'"))
+        partitions.append(Partition(name, upper_bound))
+    return partitions
+
+
+def add_monthly_partitions(db: Session, table: str, until: date) -> list[str]:
+    """
+    Splits the catch-all partition so every month up to `until` has its own
+    partition. The catch-all partition is empty in normal operation, which keeps
+    the reorganisation a metadata-only change.
+
+    :return: Names of the partitions that were created
+    """
+
+    partitions = list_partitions(db, table)
+    if not partitions or partitions[-1].name != MAX_PARTITION:
+        return []
+
+    bounded = [partition for partition in partitions if partition.upper_bound]
+    if bounded:
+        start = bounded[-1].upper_bound.date()
+    else:
+        start = month_start(date.today())
+
+    definitions = monthly_partition_definitions(start, until)
+    if not definitions:
+        return []
+
+    db.execute(
+        text(
+            f"ALTER TABLE {table} REORGANIZE PARTITION {MAX_PARTITION} INTO ("
+            + ", ".join(definitions)
+            + f", PARTITION {MAX_PARTITION} VALUES LESS THAN (MAXVALUE))"
+        )
+    )
+    return [definition.split()[1] for definition in definitions]
+
+
+def drop_partitions_before(db: Session, table: str, cutoff: datetime) -> list[str]:
+    """
+    Drops every partition whose rows are all older than `cutoff`. Dropping a
+    partition removes its rows without scanning or locking the rest of the table.
+
+    :return: Names of the dropped partitions
+    """
+
+    expired = [
+        partition.name
+        for partition in list_partitions(db, table)
+        if partition.upper_bound and partition.upper_bound <= cutoff
+    ]
+    if expired:
+        db.execute(text(f"ALTER TABLE {table} DROP PARTITION {', '.join(expired)}"))
+    return expired
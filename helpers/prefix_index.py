@@ -0,0 +1,43 @@
+from bisect import bisect_left
+from typing import Any, Iterable
+
+
+class PrefixIndex:
+    """
+    Immutable prefix lookup over sorted, lower-cased keys.
+
+    Every value can be reached through several keys. A lookup bisects to the
+    first key starting with the prefix and walks forward while keys match, so
+    it costs O(log n + results) without touching the database.
+    """
+
+    def __init__(self, entries: Iterable[tuple[str, Any]]):
+        pairs = sorted(
+            ((key.lower(), order, value) for order, (key, value) in enumerate(entries)),
+            key=lambda pair: (pair[0], pair[1]),
+        )
+        self._keys = [key for key, _, _ in pairs]
+        self._values = [value for _, _, value in pairs]
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def search(self, prefix: str, limit: int) -> list:
+        """
+        Returns up to `limit` distinct values with a key starting with `prefix`,
+        in key order.
+        """
+
+        prefix = prefix.lower()
+        found = []
+        seen = set()
+        position = bisect_left(self._keys, prefix)
+        while position < len(self._keys) and len(found) < limit:
+            if not self._keys[position].startswith(prefix):
+                break
+            value = self._values[position]
+            if id(value) not in seen:
+                seen.add(id(value))
+                found.append(value)
+            position += 1
+        return found
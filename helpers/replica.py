@@ -0,0 +1,196 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+from dotenv import load_dotenv
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError
+from starlette.datastructures import MutableHeaders
+from starlette.requests import HTTPConnection
+
+from helpers.cache import cache_backend
+
+load_dotenv()
+
+# Reads fall back to the primary while the replica is further behind than this
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "5"))
+REPLICA_LAG_CHECK_INTERVAL = float(os.getenv("REPLICA_LAG_CHECK_INTERVAL", "2"))
+# How long a client keeps reading from the primary after one of its writes
+REPLICA_STICKY_SECONDS = int(os.getenv("REPLICA_STICKY_SECONDS", "10"))
+
+READ_METHODS = ("GET", "HEAD")
+PRIMARY_COOKIE = "b7_read_primary"
+
+logger = logging.getLogger("b7.replica")
+
+
+def read_replica(endpoint):
+    """
+    Lets a route that is not a GET but only reads, such as a report, be served
+    by the replica. Place it below the router decorator.
+    """
+
+    endpoint.__read_replica__ = True
+    return endpoint
+
+
+def is_read_only(scope) -> bool:
+    return scope["method"] in READ_METHODS or getattr(
+        scope.get("endpoint"), "__read_replica__", False
+    )
+
+
+def _pin_key(scope) -> str | None:
+    # Clients authenticate with a bearer token, which identifies them without
+    # relying on cookies a cross-origin client may not send
+    authorization = HTTPConnection(scope).headers.get("authorization")
+    if not authorization:
+        return None
+    return f"primary-{hashlib.sha256(authorization.encode()).hexdigest()[:32]}"
+
+
+def reads_from_replica(scope) -> bool:
+    """
+    Whether the reads of a request may go to the replica: it has to be
+    read-only, and its client must not have written anything in the last
+    `REPLICA_STICKY_SECONDS`. Work outside of requests always uses the primary.
+    """
+
+    if scope is None or scope["type"] != "http" or not is_read_only(scope):
+        return False
+    if PRIMARY_COOKIE in HTTPConnection(scope).cookies:
+        return False
+
+    key = _pin_key(scope)
+    return key is None or not cache_backend.is_pinned(key)
+
+
+class ReplicaLagMonitor:
+    """
+    Measures the replication lag of the replica in a background thread.
+
+    The replica is only used while the last check is recent and found it at
+    most `max_lag` seconds behind. A server that is not set up as a replica
+    counts as up to date, so two independent databases work for local testing.
+    """
+
+    def __init__(
+        self,
+        engine: Engine | None,
+        max_lag: float = REPLICA_MAX_LAG_SECONDS,
+        interval: float = REPLICA_LAG_CHECK_INTERVAL,
+    ):
+        self.engine = engine
+        self.max_lag = max_lag
+        self.interval = interval
+        self.lag_seconds: float | None = None
+        self.error: str | None = None
+        self.checked_at: datetime | None = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def _ensure_started(self) -> None:
+        # The monitor thread belongs to the worker process that uses it
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+        threading.Thread(target=self._monitor_loop, daemon=True).start()
+
+    def _monitor_loop(self) -> None:
+        while True:
+            self.check()
+            time.sleep(self.interval)
+
+    def measure_lag(self) -> float | None:
+        with self.engine.connect() as connection:
+            if connection.dialect.name != "mysql":
+                connection.exec_driver_sql("SELECT 1")
+                return 0.0
+
+            try:
+                status = connection.exec_driver_sql("SHOW REPLICA STATUS")
+            except DBAPIError:
+                # MySQL before 8.0.22
+                status = connection.exec_driver_sql("SHOW SLAVE STATUS")
+            row = status.mappings().first()
+
+        if row is None:
+            return 0.0
+        # NULL while replication is stopped or broken
+        lag = row.get("Seconds_Behind_Source", row.get("Seconds_Behind_Master"))
+        return None if lag is None else float(lag)
+
+    def check(self) -> None:
+        try:
+            lag, error = self.measure_lag(), None
+        except Exception as e:
+            lag, error = None, str(e)
+            logger.warning("Replica lag check failed: %s", e)
+
+        self.lag_seconds = lag
+        self.error = error
+        self.checked_at = datetime.now()
+        self._checked = time.monotonic()
+
+    def healthy(self) -> bool:
+        if self.engine is None:
+            return False
+        self._ensure_started()
+
+        # A hanging check must not keep an outdated verdict alive
+        if time.monotonic() - self._checked > self.interval * 3:
+            return False
+        return self.lag_seconds is not None and self.lag_seconds <= self.max_lag
+
+    def status(self) -> dict:
+        return {
+            "configured": self.engine is not None,
+            "healthy": self.healthy(),
+            "lag_seconds": self.lag_seconds,
+            "max_lag_seconds": self.max_lag,
+            "checked_at": self.checked_at,
+            "error": self.error,
+        }
+
+
+class ReadYourWritesMiddleware:
+    """
+    Pins a client to the primary for `REPLICA_STICKY_SECONDS` after a
+    successful write, so it reads its own changes while the replica catches up.
+
+    The pin is kept on the cache backend under the client's bearer token, so
+    it holds across workers with a shared backend and does not depend on the
+    client sending cookies. Clients that do send them also get a cookie.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        # CORS preflights do not write either
+        if scope["type"] != "http" or scope["method"] in (*READ_METHODS, "OPTIONS"):
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_cookie(message):
+            if (
+                message["type"] == "http.response.start"
+                and message["status"] < 400
+                and not is_read_only(scope)
+            ):
+                key = _pin_key(scope)
+                if key is not None:
+                    cache_backend.pin(key, REPLICA_STICKY_SECONDS)
+                MutableHeaders(scope=message).append(
+                    "Set-Cookie",
+                    f"{PRIMARY_COOKIE}=1; Max-Age={REPLICA_STICKY_SECONDS}; "
+                    "Path=/; HttpOnly; SameSite=Lax",
+                )
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
@@ -0,0 +1,141 @@
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import NullPool
+
+from helpers.instrumentation import current_route
+
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "500"))
+SLOW_QUERY_TOP_N = int(os.getenv("SLOW_QUERY_TOP_N", "50"))
+SLOW_QUERY_EXPLAIN = os.getenv("SLOW_QUERY_EXPLAIN", "true").lower() == "true"
+# The same statement is explained at most once in this many seconds
+EXPLAIN_INTERVAL = 300
+EXPLAINABLE = ("select", "update", "delete", "insert", "replace")
+
+logger = logging.getLogger("b7.slow_queries")
+
+
+class SlowQueryLog:
+    """
+    Keeps the slowest statements seen by this worker.
+
+    Statements slower than the threshold are logged with their parameters and
+    the route that ran them. Their `EXPLAIN` plan is captured on a separate
+    connection by a background thread, so the request that ran the statement
+    is not slowed down further.
+    """
+
+    def __init__(self, threshold_ms: float, top_n: int, explain: bool):
+        self.threshold_ms = threshold_ms
+        self.top_n = top_n
+        self.explain = explain
+        self._lock = threading.Lock()
+        # Min-heap on duration, so the fastest of the top N is dropped first
+        self._heap: list[tuple[float, int, dict]] = []
+        self._sequence = itertools.count()
+        self._explained_at: dict[str, float] = {}
+        self._engine_url = None
+        self._explain_engine = None
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+    def install(self, engine: Engine) -> None:
+        # Plans are captured on the first engine installed, the primary
+        if self._engine_url is None:
+            self._engine_url = engine.url
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def before_cursor_execute(
+            conn, cursor, statement, parameters, context, executemany
+        ):
+            conn.info.setdefault("slow_query_started", []).append(time.perf_counter())
+
+        @event.listens_for(engine, "after_cursor_execute")
+        def after_cursor_execute(
+            conn, cursor, statement, parameters, context, executemany
+        ):
+            started = conn.info["slow_query_started"].pop()
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            if elapsed_ms >= self.threshold_ms:
+                self.record(statement, parameters, elapsed_ms, executemany)
+
+    def record(
+        self, statement: str, parameters, elapsed_ms: float, executemany: bool
+    ) -> None:
+        entry = {
+            "statement": statement,
+            "parameters": repr(parameters)[:1000],
+            "duration_ms": round(elapsed_ms, 2),
+            "route": current_route(),
+            "timestamp": datetime.now(),
+            "explain": None,
+        }
+        logger.warning(
+            "Slow query (%.1f ms) on %s: %s %s",
+            elapsed_ms,
+            entry["route"],
+            statement,
+            entry["parameters"],
+        )
+
+        with self._lock:
+            item = (elapsed_ms, next(self._sequence), entry)
+            if len(self._heap) < self.top_n:
+                heapq.heappush(self._heap, item)
+            elif elapsed_ms > self._heap[0][0]:
+                heapq.heapreplace(self._heap, item)
+            else:
+                return
+
+        if self.explain and not executemany and self._should_explain(statement):
+            self._executor.submit(self._capture_explain, entry, parameters)
+
+    def _should_explain(self, statement: str) -> bool:
+        if not statement.lstrip().lower().startswith(EXPLAINABLE):
+            return False
+        now = time.monotonic()
+        with self._lock:
+            explained_at = self._explained_at.get(statement)
+            if explained_at is not None and now - explained_at < EXPLAIN_INTERVAL:
+                return False
+            self._explained_at[statement] = now
+        return True
+
+    def _capture_explain(self, entry: dict, parameters) -> None:
+        try:
+            if self._explain_engine is None:
+                # Own connections, so explains never wait on the request pool
+                self._explain_engine = create_engine(
+                    self._engine_url, poolclass=NullPool
+                )
+            with self._explain_engine.connect() as connection:
+                result = connection.exec_driver_sql(
+                    f"EXPLAIN {entry['statement']}", parameters
+                )
+                plan = [dict(row._mapping) for row in result]
+        except Exception as e:
+            plan = [{"error": str(e)}]
+
+        entry["explain"] = plan
+        logger.warning("Plan of slow query %s: %s", entry["statement"], plan)
+
+    def entries(self) -> list[dict]:
+        with self._lock:
+            return [entry for _, _, entry in sorted(self._heap, reverse=True)]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._heap = []
+            self._explained_at = {}
+
+
+slow_query_log = SlowQueryLog(
+    SLOW_QUERY_THRESHOLD_MS, SLOW_QUERY_TOP_N, SLOW_QUERY_EXPLAIN
+)
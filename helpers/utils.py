@@ -1,15 +1,47 @@
 import array
 from datetime import timedelta
 
+DAYS_PER_MONTH = 31  # mean month length used for every date calculation
+
+
+def months_to_days(years, months=0):
+    """
+    Converts a shelf life expressed in years (and extra months) into days.
+
+    Args:
+      years: Number of years, fractional values are truncated to whole months.
+      months: Extra months to add on top of the years.
+
+    Returns:
+      The number of days used by `add_years_and_months` for the same inputs.
+    """
+
+    total_months = int(years * 12) + months
+    return total_months * DAYS_PER_MONTH
+
+
+def prefix_pattern(prefix):
+    """
+    Builds a LIKE pattern matching values that start with `prefix`.
+
+    Wildcards in the prefix are escaped, so the pattern stays a plain prefix
+    match that an index on the column can serve.
+
+    Args:
+      prefix: The text the values must start with.
+
+    Returns:
+      The pattern, to be used with `escape="\\"`.
+    """
+
+    escaped = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"{escaped}%"
+
 
 def add_years_and_months(start_date, years, months=0):
     try:
-        # Calculate the total number of months to add
-        total_months = int(years * 12) + months
         # Calculate the end date by adding the total months to the start date
-        end_date = start_date + timedelta(
-            days=total_months * 31  # mean month length
-        )
+        end_date = start_date + timedelta(days=months_to_days(years, months))
 
         return end_date
     except ValueError:
@@ -0,0 +1,61 @@
+from fastapi import Request, Response
+
+from helpers.cache import cache_backend
+
+
+def _namespace(table: str) -> str:
+    return f"version-{table}"
+
+
+def bump_version(table: str) -> None:
+    """
+    Marks every cached representation of a table as outdated.
+
+    The version lives on the cache backend, so a shared backend bumps the
+    ETags served by every worker.
+
+    Args:
+      table: Name of the table that was written to.
+    """
+
+    cache_backend.bump_generation(_namespace(table))
+
+
+def get_etag(table: str, *parts) -> str:
+    """
+    Builds the ETag of a response that only depends on one table.
+
+    Args:
+      table: Name of the table the response is read from.
+      parts: Request values that select the returned rows, e.g. skip and limit.
+
+    Returns:
+      A weak ETag that changes whenever `bump_version` is called for the table.
+    """
+
+    # The epoch keeps tokens from matching ETags handed out before the
+    # versions were reset, e.g. by a restart
+    epoch = cache_backend.get_epoch()
+    version = cache_backend.get_generation(_namespace(table))
+    selector = "-".join(str(part) for part in parts)
+    return f'W/"{table}-{epoch}-{version}-{selector}"'
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    """
+    Checks the `If-None-Match` header of a request against the current ETag.
+    """
+
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+
+    candidates = {candidate.strip() for candidate in if_none_match.split(",")}
+    # Weak comparison, as required for If-None-Match
+    return "*" in candidates or etag.removeprefix("W/") in {
+        candidate.removeprefix("W/") for candidate in candidates
+    }
+
+
+def not_modified_response(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag})
@@ -0,0 +1,167 @@
+import argparse
+import os
+
+from sqlalchemy.orm import sessionmaker
+
+from config.db import create_app_engine
+from routes.actions import audit_action, sample_action
+
+# Maintenance commands run long statements on purpose, so their engine goes
+# without the statement timeout meant for requests
+SessionLocal = sessionmaker(
+    autocommit=False,
+    autoflush=False,
+    bind=create_app_engine(
+        os.getenv("DATABASE_URL"), "maintenance", statement_timeout_ms=0
+    ),
+)
+
+
+def recompute_dates(args):
+    db = SessionLocal()
+    try:
+        result = sample_action.recompute_all_sample_dates(
+            db, chunk_size=args.chunk_size
+        )
+    finally:
+        db.close()
+
+    print(
+        f"Recomputed {result.retained} retained and {result.referenced} referenced "
+        f"samples in {result.elapsed_seconds}s ({result.rows_per_second} rows/s)"
+    )
+
+
+def purge_audit(args):
+    db = SessionLocal()
+    try:
+        result = audit_action.purge_log(
+            db,
+            older_than_days=args.days,
+            chunk_size=args.chunk_size,
+            pause=args.pause_ms / 1000,
+            archive=args.archive,
+        )
+    finally:
+        db.close()
+
+    print(
+        f"Archived {result.archived_rows} entries, "
+        f"dropped {len(result.dropped_partitions)} partitions and deleted "
+        f"{result.deleted_rows} audit entries older than {result.cutoff} "
+        f"in {result.elapsed_seconds}s"
+    )
+
+
+def archive_audit(args):
+    db = SessionLocal()
+    try:
+        segments = audit_action.archive_log(db, older_than_days=args.days)
+    finally:
+        db.close()
+
+    for segment in segments:
+        print(f"{segment.segment}: {segment.rows} entries, {segment.bytes} bytes")
+    print(f"Archived {sum(segment.rows for segment in segments)} audit entries")
+
+
+def audit_partitions(args):
+    db = SessionLocal()
+    try:
+        created = audit_action.extend_partitions(db, months_ahead=args.months_ahead)
+        db.commit()
+    finally:
+        db.close()
+
+    print(f"Created audit partitions: {', '.join(created) or 'none'}")
+
+
+def sample_partitions(args):
+    db = SessionLocal()
+    try:
+        created = sample_action.extend_partitions(db, months_ahead=args.months_ahead)
+        db.commit()
+    finally:
+        db.close()
+
+    print(f"Created sample partitions: {', '.join(created) or 'none'}")
+
+
+def check_orphans(args):
+    db = SessionLocal()
+    try:
+        orphans = sample_action.find_orphan_samples(db)
+    finally:
+        db.close()
+
+    for table, counts in orphans.items():
+        print(
+            f"{table}: {counts['products']} without product, "
+            f"{counts['racks']} without rack"
+        )
+    if any(count for counts in orphans.values() for count in counts.values()):
+        raise SystemExit("Found samples whose product or rack does not exist")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="B7 Locator maintenance commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    recompute = commands.add_parser(
+        "recompute-dates",
+        help="Rebuild every sample expiration and destroy date from product shelf life",
+    )
+    recompute.add_argument(
+        "--chunk-size", type=int, default=sample_action.RECOMPUTE_CHUNK_SIZE
+    )
+    recompute.set_defaults(func=recompute_dates)
+
+    purge = commands.add_parser(
+        "purge-audit", help="Remove audit entries past the retention period"
+    )
+    purge.add_argument("--days", type=int, default=audit_action.AUDIT_RETENTION_DAYS)
+    purge.add_argument(
+        "--chunk-size", type=int, default=audit_action.AUDIT_PURGE_CHUNK_SIZE
+    )
+    purge.add_argument(
+        "--pause-ms", type=int, default=int(audit_action.AUDIT_PURGE_PAUSE * 1000)
+    )
+    purge.add_argument(
+        "--archive",
+        action=argparse.BooleanOptionalAction,
+        default=audit_action.AUDIT_ARCHIVE_BEFORE_PURGE,
+        help="Copy the entries to the audit archive before removing them",
+    )
+    purge.set_defaults(func=purge_audit)
+
+    archive = commands.add_parser(
+        "archive-audit", help="Copy old audit entries to compressed archive segments"
+    )
+    archive.add_argument("--days", type=int, default=audit_action.AUDIT_RETENTION_DAYS)
+    archive.set_defaults(func=archive_audit)
+
+    audit_partition = commands.add_parser(
+        "audit-partitions", help="Create the monthly audit partitions ahead of time"
+    )
+    audit_partition.add_argument("--months-ahead", type=int, default=2)
+    audit_partition.set_defaults(func=audit_partitions)
+
+    sample_partition = commands.add_parser(
+        "sample-partitions",
+        help="Create the monthly destroy date partitions of the sample tables",
+    )
+    sample_partition.add_argument("--months-ahead", type=int, default=60)
+    sample_partition.set_defaults(func=sample_partitions)
+
+    orphans = commands.add_parser(
+        "check-orphans",
+        help="Find samples whose product or rack does not exist",
+    )
+    orphans.set_defaults(func=check_orphans)
+
+    return parser
+
+
+if __name__ == "__main__":
+    args = build_parser().parse_args()
+    args.func(args)
@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, Date, DateTime, Float, ForeignKey, func
+from sqlalchemy import Boolean, Column, Date, DateTime, Float, ForeignKey, Index, func
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql.sqltypes import Integer, String
@@ -25,62 +25,132 @@ class Audit(Base):
     method = Column(String(255))
     request = Column(String(255))
     response = Column(String(255))
-    timestamp = Column(DateTime(timezone=True), server_default=func.now())
+    # Part of the primary key in MySQL, where the table is partitioned by month
+    timestamp = Column(
+        DateTime(timezone=True), nullable=False, server_default=func.now()
+    )
 
 
 class Product(Base):
     __tablename__ = "products"
 
     product_code = Column(String(5), primary_key=True, unique=True, nullable=False)
-    product_name = Column(String(255), nullable=False)
+    product_name = Column(String(255), nullable=False, index=True)
     shelf_life = Column(Float, nullable=False)
-    product_type = Column(String(10))
+    product_type = Column(String(10), index=True)
     package = Column(String(255))
 
     retained_sample = relationship(
-        "SampleRetained", back_populates="product", cascade="all, delete-orphan"
+        "SampleRetained",
+        back_populates="product",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
     )
     referenced_sample = relationship(
-        "SampleReferenced", back_populates="product", cascade="all, delete-orphan"
+        "SampleReferenced",
+        back_populates="product",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
     )
 
 
 class SampleRetained(Base):
     __tablename__ = "samples_retained"
+    # Serves the product side of the sample search, newest first
+    __table_args__ = (
+        Index("ix_samples_retained_product_code_id", "product_code", "id"),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
+    # On MySQL the table is partitioned by destroy_date, which rules out foreign
+    # keys there. The references only serve the ORM relationships: deleting a
+    # product or rack removes its samples in the application, with
+    # `sample_action.delete_samples_of`, not through the database
     rack_id = Column(String(5), ForeignKey("racks.rack_id"))
     product_code = Column(String(5), ForeignKey("products.product_code"))
-    batch_number = Column(String(5))
-    manufacturing_date = Column(Date)
-    expiration_date = Column(Date)
-    destroy_date = Column(Date)
+    batch_number = Column(String(5), index=True)
+    manufacturing_date = Column(Date, index=True)
+    expiration_date = Column(Date, index=True)
+    # Part of the primary key in MySQL, where it is the partitioning column
+    destroy_date = Column(Date, index=True, nullable=False)
     product = relationship("Product", back_populates="retained_sample")
     rack = relationship("Rack", back_populates="retained_sample")
 
 
 class SampleReferenced(Base):
     __tablename__ = "samples_referenced"
+    # Serves the product side of the sample search, newest first
+    __table_args__ = (
+        Index("ix_samples_referenced_product_code_id", "product_code", "id"),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
+    # On MySQL the table is partitioned by destroy_date, which rules out foreign
+    # keys there. The references only serve the ORM relationships: deleting a
+    # product or rack removes its samples in the application, with
+    # `sample_action.delete_samples_of`, not through the database
     rack_id = Column(String(5), ForeignKey("racks.rack_id"))
     product_code = Column(String(5), ForeignKey("products.product_code"))
-    batch_number = Column(String(5))
-    manufacturing_date = Column(Date)
-    expiration_date = Column(Date)
-    destroy_date = Column(Date)
+    batch_number = Column(String(5), index=True)
+    manufacturing_date = Column(Date, index=True)
+    expiration_date = Column(Date, index=True)
+    # Part of the primary key in MySQL, where it is the partitioning column
+    destroy_date = Column(Date, index=True, nullable=False)
     product = relationship("Product", back_populates="referenced_sample")
     rack = relationship("Rack", back_populates="referenced_sample")
 
 
+# Destroyed samples are moved out of the live tables into these history tables
+class SampleRetainedHistory(Base):
+    __tablename__ = "samples_retained_history"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    rack_id = Column(String(5))
+    product_code = Column(String(5), index=True)
+    batch_number = Column(String(5), index=True)
+    manufacturing_date = Column(Date)
+    expiration_date = Column(Date)
+    destroy_date = Column(Date, index=True)
+    destroyed_at = Column(DateTime(timezone=True), server_default=func.now())
+    product = relationship(
+        "Product",
+        primaryjoin="foreign(SampleRetainedHistory.product_code) == Product.product_code",
+        viewonly=True,
+    )
+
+
+class SampleReferencedHistory(Base):
+    __tablename__ = "samples_referenced_history"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    rack_id = Column(String(5))
+    product_code = Column(String(5), index=True)
+    batch_number = Column(String(5), index=True)
+    manufacturing_date = Column(Date)
+    expiration_date = Column(Date)
+    destroy_date = Column(Date, index=True)
+    destroyed_at = Column(DateTime(timezone=True), server_default=func.now())
+    product = relationship(
+        "Product",
+        primaryjoin="foreign(SampleReferencedHistory.product_code) == Product.product_code",
+        viewonly=True,
+    )
+
+
 class Rack(Base):
     __tablename__ = "racks"
     rack_id = Column(String(5), primary_key=True, unique=True)
     max_stored = Column(Integer, nullable=False)
     location = Column(String(255))
     retained_sample = relationship(
-        "SampleRetained", back_populates="rack", cascade="all, delete-orphan"
+        "SampleRetained",
+        back_populates="rack",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
     )
     referenced_sample = relationship(
-        "SampleReferenced", back_populates="rack", cascade="all, delete-orphan"
+        "SampleReferenced",
+        back_populates="rack",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
     )
@@ -79,22 +79,22 @@ class PDF(FPDF):
             )
 
 
-def generate_destroy_report(
-    samples: List[schemas.DestroyObject],
-    date: date,
-    product_type: str,
-    SampleModel: models.SampleReferenced | models.SampleRetained,
-):
-    header = (
+def _section_title(SampleModel: models.SampleReferenced | models.SampleRetained) -> str:
+    return (
         "Retained Sampel"
         if SampleModel.__tablename__ == "samples_retained"
         else "Referenced Sampel"
     )
-    pdf = PDF(orientation="landscape", format="A4")
-    pdf.add_page()
 
-    pdf.set_auto_page_break(True, 70)
-    pdf.set_font("Helvetica", size=10)
+
+def _add_destroy_section(
+    pdf: PDF,
+    samples: List[schemas.DestroyObject],
+    date: date,
+    product_type: str,
+    header: str,
+) -> None:
+    pdf.add_page()
 
     with pdf.table(
         line_height=20, col_widths=COLUMN_WIDTHS, text_align=Align.C
@@ -151,12 +151,29 @@ def generate_destroy_report(
             table_row.cell(data_row.product_name)
             table_row.cell(data_row.batch_numbers)
             table_row.cell(data_row.package)
-            table_row.cell(str(data_row.shelf_life))
+            table_row.cell(f"{data_row.shelf_life:g}")
             table_row.cell(data_row.manufacturing_date.strftime("%b-%y"))
             table_row.cell(data_row.expiration_date.strftime("%b-%y"))
             table_row.cell(data_row.destroy_date.strftime("%b-%y"))
             table_row.cell(str(data_row.weight), style=fill_grey_style)
 
+
+def _new_report() -> PDF:
+    pdf = PDF(orientation="landscape", format="A4")
+    pdf.set_auto_page_break(True, 70)
+    pdf.set_font("Helvetica", size=10)
+    return pdf
+
+
+def generate_destroy_report(
+    samples: List[schemas.DestroyObject],
+    date: date,
+    product_type: str,
+    SampleModel: models.SampleReferenced | models.SampleRetained,
+):
+    pdf = _new_report()
+    _add_destroy_section(pdf, samples, date, product_type, _section_title(SampleModel))
+
     # Save PDF to a file
     pdf.finished = True
     pdf_file_path = (
@@ -165,3 +182,29 @@ def generate_destroy_report(
     # pdf.output(pdf_file_path)
 
     return pdf, pdf_file_path
+
+
+def generate_combined_destroy_report(
+    sections: List[
+        tuple[
+            models.SampleReferenced | models.SampleRetained,
+            List[schemas.DestroyObject],
+        ]
+    ],
+    date: date,
+    product_type: str,
+):
+    """
+    Renders one section per sample type, each starting on a new page, with the
+    signature block once at the end of the document.
+    """
+    pdf = _new_report()
+    for SampleModel, samples in sections:
+        _add_destroy_section(
+            pdf, samples, date, product_type, _section_title(SampleModel)
+        )
+
+    pdf.finished = True
+    pdf_file_path = f"samples_destroy-report_{date.strftime('%Y-%b-%d')}.pdf"
+
+    return pdf, pdf_file_path
@@ -1,50 +1,137 @@
+import os
+import time
+from datetime import date, datetime, timedelta
 from typing import List
 
+from dotenv import load_dotenv
 from fastapi import HTTPException
-from sqlalchemy import or_
+from sqlalchemy import func, select
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
 
+from helpers import partitions
+from helpers.audit_archive import audit_archive
+from helpers.audit_sink import SqlAuditSink, audit_sink
 from models import models
 from schemas import audit_schemas
 
+load_dotenv()
+
+# Audit entries older than this are removed by the purge job
+AUDIT_RETENTION_DAYS = int(os.getenv("AUDIT_RETENTION_DAYS", "90"))
+AUDIT_PURGE_CHUNK_SIZE = int(os.getenv("AUDIT_PURGE_CHUNK_SIZE", "5000"))
+AUDIT_PURGE_PAUSE = int(os.getenv("AUDIT_PURGE_PAUSE_MS", "100")) / 1000
+# Copy entries to the compressed archive before they are purged
+AUDIT_ARCHIVE_BEFORE_PURGE = (
+    os.getenv("AUDIT_ARCHIVE_BEFORE_PURGE", "true").lower() == "true"
+)
+
 
 def get_log(
     db: Session,
-    query: List[str],
+    query: str,
     skip: int,
     limit: int,
 ) -> List[audit_schemas.AuditOutput]:
-    if query:
-        filter_condition = or_(
-            models.Audit.headers.like(f"%{q}%")
-            | models.Audit.request.like(f"%{q}%")
-            | models.Audit.timestamp.like(f"%{q}%")
-            for q in query
-        )
-        log = (
-            db.query(models.Audit)
-            .filter(filter_condition)
-            .offset(skip)
-            .limit(limit)
-            .all()
-        )
-    else:
-        log = db.query(models.Audit).offset(skip).limit(limit).all()
-
-    return log
-
-
-def clear_all_log(
+    # Read from whichever sink the entries are written to
+    return audit_sink.read(query, skip, limit)
+
+
+def purge_log(
     db: Session,
-) -> List[audit_schemas.AuditOutput]:
+    older_than_days: int | None = AUDIT_RETENTION_DAYS,
+    chunk_size: int = AUDIT_PURGE_CHUNK_SIZE,
+    pause: float = AUDIT_PURGE_PAUSE,
+    archive: bool = AUDIT_ARCHIVE_BEFORE_PURGE,
+) -> audit_schemas.AuditPurgeResult:
+    """Removes audit entries older than the retention period.
+
+    The entries are removed from whichever sink they are written to. The SQL
+    sink drops monthly partitions that are entirely past the cutoff and
+    deletes the remaining old rows in chunks, the file sink removes old
+    segment files.
+
+    Args:
+        db: A SQLAlchemy Session object.
+        older_than_days: Keep entries younger than this many days, or remove
+            every entry if None.
+        chunk_size: Maximum number of rows removed by one DELETE.
+        pause: Seconds to sleep between chunks.
+        archive: Copy the entries to the audit archive before removing them.
+            Only the `audit` table of the SQL sink is archived.
+
+    Returns:
+        The cutoff used, archived rows, dropped partitions and the number of
+        deleted rows.
+    """
+    started = time.perf_counter()
+    # Only the audit table is archived, and only its timestamps are set by
+    # the database clock
+    in_database = isinstance(audit_sink, SqlAuditSink)
+    archive = archive and in_database
+
+    cutoff = None
+    if older_than_days is not None:
+        now = db.scalar(select(func.now())) if in_database else datetime.now()
+        cutoff = now - timedelta(days=older_than_days)
+    elif archive:
+        # Entries logged after the archive run must not be purged unarchived
+        cutoff = db.scalar(select(func.now()))
+
+    archived = 0
+    if archive:
+        segments = audit_archive.archive(db, before=cutoff)
+        archived = sum(segment["rows"] for segment in segments)
+
     try:
-        # Query logs to be cleared
-        logs_to_clear = db.query(models.Audit).delete()
-
-        # Return the list of deleted logs
-        return logs_to_clear
-    except SQLAlchemyError as e:
-        # Handle any database errors
-        db.rollback()
+        dropped, deleted = audit_sink.purge(cutoff, chunk_size, pause)
+    except (SQLAlchemyError, OSError):
+        # Handle any database or file errors
         raise HTTPException(status_code=500, detail="Failed to clear logs")
+
+    return audit_schemas.AuditPurgeResult(
+        cutoff=cutoff,
+        archived_rows=archived,
+        dropped_partitions=dropped,
+        deleted_rows=deleted,
+        elapsed_seconds=round(time.perf_counter() - started, 3),
+    )
+
+
+def clear_all_log(db: Session) -> audit_schemas.AuditPurgeResult:
+    return purge_log(db, older_than_days=None)
+
+
+def extend_partitions(db: Session, months_ahead: int = 2) -> List[str]:
+    """Creates the monthly audit partitions for the coming months.
+
+    Args:
+        db: A SQLAlchemy Session object.
+        months_ahead: Number of months after the current one to prepare.
+
+    Returns:
+        Names of the created partitions.
+    """
+    until = date.today()
+    for _ in range(months_ahead):
+        until = partitions.next_month(until)
+    return partitions.add_monthly_partitions(db, models.Audit.__tablename__, until)
+
+
+def archive_log(
+    db: Session, older_than_days: int = AUDIT_RETENTION_DAYS
+) -> List[audit_schemas.ArchiveSegment]:
+    """Copies audit entries older than the given age to the compressed archive.
+
+    Args:
+        db: A SQLAlchemy Session object.
+        older_than_days: Archive entries older than this many days.
+
+    Returns:
+        Index entries of the newly written segments.
+    """
+    cutoff = db.scalar(select(func.now())) - timedelta(days=older_than_days)
+    return [
+        audit_schemas.ArchiveSegment(**segment)
+        for segment in audit_archive.archive(db, before=cutoff)
+    ]
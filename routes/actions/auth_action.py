@@ -10,6 +10,7 @@ from jose import JWTError, jwt
 from sqlalchemy.orm import Session
 
 from config.db import SessionLocal
+from helpers.instrumentation import measure
 from models import models
 from schemas import auth_schemas
 
@@ -68,9 +69,10 @@ def get_current_user(
     )
     token = credentials.credentials
 
-    token = verify_token_access(token, credentials_exception)
+    with measure("auth"):
+        token = verify_token_access(token, credentials_exception)
 
-    user = db.query(models.User).filter(models.User.id == token.id).first()
+        user = db.query(models.User).filter(models.User.id == token.id).first()
     request.state.username = user.username
 
     return user
@@ -0,0 +1,166 @@
+import os
+from typing import List
+
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from helpers.cache import TTLCache
+from helpers.prefix_index import PrefixIndex
+from helpers.utils import prefix_pattern
+from helpers.versioning import bump_version
+from models import models
+from schemas import schemas
+
+PRODUCT_CACHE_TTL = float(os.getenv("PRODUCT_CACHE_TTL", "300"))
+
+product_cache = TTLCache("products", ttl=PRODUCT_CACHE_TTL)
+
+
+def get_product(db: Session, product_code: str) -> schemas.Product | None:
+    """Retrieves a product from the catalog cache, reading through to the database.
+
+    Args:
+        db: A SQLAlchemy Session object, used only on a cache miss. The cache
+            is always filled from the primary.
+        product_code: The code of the product to retrieve.
+
+    Returns:
+        The product with the given code, or None if not found.
+    """
+
+    def load():
+        product = (
+            db.query(models.Product)
+            .filter(models.Product.product_code == product_code)
+            .execution_options(read_primary=True)
+            .first()
+        )
+        return schemas.Product.model_validate(product) if product else None
+
+    return product_cache.get(product_code, load)
+
+
+def lock_products(db: Session, product_codes: List[str]) -> dict[str, schemas.Product]:
+    """Reads products for a sample write, bypassing the catalog cache.
+
+    The products are share-locked until the caller's transaction ends, so they
+    cannot be deleted while samples referring to them are stored. The sample
+    tables have no foreign keys, this is what keeps them consistent.
+
+    Args:
+        db: A SQLAlchemy Session object, inside the write transaction.
+        product_codes: The codes of the products to read.
+
+    Returns:
+        The existing products keyed by their code.
+    """
+    if not product_codes:
+        return {}
+
+    products = (
+        db.query(models.Product)
+        .filter(models.Product.product_code.in_(product_codes))
+        .with_for_update(read=True)
+        .all()
+    )
+    return {
+        product.product_code: schemas.Product.model_validate(product)
+        for product in products
+    }
+
+
+def get_products_page(db: Session, skip: int, limit: int) -> List[schemas.Product]:
+    """Retrieves one page of the product catalog through the catalog cache.
+
+    Args:
+        db: A SQLAlchemy Session object, used only on a cache miss. The cache
+            is always filled from the primary.
+        skip: Number of products to skip.
+        limit: Maximum number of products to retrieve.
+
+    Returns:
+        The products of the requested page.
+    """
+
+    def load():
+        products = (
+            db.query(models.Product)
+            .offset(skip)
+            .limit(limit)
+            .execution_options(read_primary=True)
+            .all()
+        )
+        return [schemas.Product.model_validate(product) for product in products]
+
+    return product_cache.get(("page", skip, limit), load)
+
+
+def find_product_codes(db: Session, prefix: str) -> List[str]:
+    """Finds the products whose code or name starts with the given prefix.
+
+    Both conditions are prefix matches on indexed columns of the small products
+    table, so the lookup stays cheap however many samples exist.
+
+    Args:
+        db: A SQLAlchemy Session object.
+        prefix: The text the product code or name must start with.
+
+    Returns:
+        The codes of the matching products.
+    """
+    pattern = prefix_pattern(prefix)
+    rows = db.query(models.Product.product_code).filter(
+        or_(
+            models.Product.product_code.like(pattern, escape="\\"),
+            models.Product.product_name.like(pattern, escape="\\"),
+        )
+    )
+    return [product_code for (product_code,) in rows]
+
+
+def get_suggest_index(db: Session) -> PrefixIndex:
+    """Retrieves the autocomplete index of the catalog through the catalog cache.
+
+    The index is built from the whole catalog on a miss and is dropped with
+    the rest of the cache whenever a product is written.
+
+    Args:
+        db: A SQLAlchemy Session object, used only on a cache miss. The cache
+            is always filled from the primary.
+
+    Returns:
+        Products keyed by their code, their name and every word of their name.
+    """
+
+    def load():
+        entries = []
+        products = db.query(models.Product).execution_options(read_primary=True)
+        for product in products:
+            product = schemas.Product.model_validate(product)
+            entries.append((product.product_code, product))
+            entries.append((product.product_name, product))
+            entries.extend((word, product) for word in product.product_name.split()[1:])
+        return PrefixIndex(entries)
+
+    return product_cache.get("suggest-index", load)
+
+
+def suggest_products(db: Session, q: str, limit: int) -> List[schemas.Product]:
+    """Suggests products whose code, name or a word of the name starts with `q`.
+
+    Args:
+        db: A SQLAlchemy Session object, used only to rebuild the index.
+        q: The text typed so far.
+        limit: Maximum number of suggestions.
+
+    Returns:
+        The matching products.
+    """
+    return get_suggest_index(db).search(q.strip(), limit)
+
+
+def invalidate_product_catalog() -> None:
+    """Drops cached products and product ETags in every worker after a write."""
+
+    product_cache.invalidate()
+    bump_version(models.Product.__tablename__)
@@ -1,6 +1,17 @@
+import os
+import threading
+import time
+from typing import List
+
+from fastapi import HTTPException
+from sqlalchemy import func, select, update
 from sqlalchemy.orm import Session
 
-from models.models import Rack
+from models.models import Rack, SampleReferenced, SampleRetained
+from schemas import schemas
+
+RACK_OCCUPANCY_TTL = float(os.getenv("RACK_OCCUPANCY_TTL", "30"))
+AUTO_RACK_ID = "auto"
 
 
 def get_rack_by_id(db: Session, id: str) -> Rack | None:
@@ -17,3 +28,431 @@ def get_rack_by_id(db: Session, id: str) -> Rack | None:
     rack = db.query(Rack).filter(Rack.rack_id == id).first()
 
     return rack
+
+
+def query_rack_occupancy(db: Session) -> List[schemas.RackOccupancy]:
+    """Counts the samples stored on every rack with a single grouped query.
+
+    The counts fill the occupancy index, so they are always read from the
+    primary.
+
+    Args:
+        db: A SQLAlchemy Session object.
+
+    Returns:
+        The occupancy of every rack, ordered by rack id.
+    """
+
+    retained = (
+        select(SampleRetained.rack_id, func.count().label("total"))
+        .group_by(SampleRetained.rack_id)
+        .subquery()
+    )
+    referenced = (
+        select(SampleReferenced.rack_id, func.count().label("total"))
+        .group_by(SampleReferenced.rack_id)
+        .subquery()
+    )
+    rows = db.execute(
+        select(
+            Rack.rack_id,
+            Rack.location,
+            Rack.max_stored,
+            func.coalesce(retained.c.total, 0).label("retained_count"),
+            func.coalesce(referenced.c.total, 0).label("referenced_count"),
+        )
+        .outerjoin(retained, retained.c.rack_id == Rack.rack_id)
+        .outerjoin(referenced, referenced.c.rack_id == Rack.rack_id)
+        .order_by(Rack.rack_id)
+        .execution_options(read_primary=True)
+    ).all()
+
+    return [
+        schemas.RackOccupancy(
+            rack_id=row.rack_id,
+            location=row.location,
+            max_stored=row.max_stored,
+            retained_count=row.retained_count,
+            referenced_count=row.referenced_count,
+            free_slots=max(
+                row.max_stored - row.retained_count - row.referenced_count, 0
+            ),
+        )
+        for row in rows
+    ]
+
+
+class RackOccupancyIndex:
+    """In-memory view of how many samples every rack holds.
+
+    The index is loaded with `query_rack_occupancy` and then patched by every
+    sample write made through this process, so allocations and capacity checks
+    never have to count samples in the database. It is reloaded after
+    `RACK_OCCUPANCY_TTL` seconds to pick up writes made by other workers, and
+    immediately after `invalidate` for writes that change the racks themselves.
+
+    Slots taken by `reserve` and `allocate` stay pending until the write is
+    settled with `confirm` or `cancel`. Reloads add the pending slots to the
+    stored counts, so a reload never hands out a slot that is about to be used.
+    """
+
+    def __init__(self, ttl: float = RACK_OCCUPANCY_TTL):
+        self.ttl = ttl
+        self._lock = threading.RLock()
+        self._racks: dict[str, dict] = {}
+        self._expires_at = 0.0
+        self._generation = 0
+        # Slots reserved by writes that are not committed yet
+        self._pending: dict[tuple[str, str], int] = {}
+
+    def _ensure_loaded(self, db: Session) -> None:
+        while True:
+            with self._lock:
+                if self._expires_at > time.monotonic():
+                    return
+                generation = self._generation
+
+            occupancy = query_rack_occupancy(db)
+
+            with self._lock:
+                # A result that raced with an invalidation may predate the
+                # change behind it, load again instead of using it
+                if self._generation != generation:
+                    continue
+                self._racks = {
+                    rack.rack_id: {
+                        "location": rack.location,
+                        "max_stored": rack.max_stored,
+                        "retained": rack.retained_count
+                        + self._pending.get((rack.rack_id, "retained"), 0),
+                        "referenced": rack.referenced_count
+                        + self._pending.get((rack.rack_id, "referenced"), 0),
+                    }
+                    for rack in occupancy
+                }
+                self._expires_at = time.monotonic() + self.ttl
+                return
+
+    def _take(self, rack_id: str, kind: str) -> None:
+        self._racks[rack_id][kind] += 1
+        self._pending[(rack_id, kind)] = self._pending.get((rack_id, kind), 0) + 1
+
+    def _settle(self, rack_id: str | None, kind: str) -> bool:
+        pending = self._pending.get((rack_id, kind), 0)
+        if pending <= 0:
+            return False
+        if pending == 1:
+            del self._pending[(rack_id, kind)]
+        else:
+            self._pending[(rack_id, kind)] = pending - 1
+        return True
+
+    @staticmethod
+    def _free_slots(rack: dict) -> int:
+        return rack["max_stored"] - rack["retained"] - rack["referenced"]
+
+    def snapshot(self, db: Session) -> List[schemas.RackOccupancy]:
+        """Returns the occupancy of every rack, ordered by rack id."""
+
+        self._ensure_loaded(db)
+        with self._lock:
+            return [
+                schemas.RackOccupancy(
+                    rack_id=rack_id,
+                    location=rack["location"],
+                    max_stored=rack["max_stored"],
+                    retained_count=rack["retained"],
+                    referenced_count=rack["referenced"],
+                    free_slots=max(self._free_slots(rack), 0),
+                )
+                for rack_id, rack in sorted(self._racks.items())
+            ]
+
+    def reserve(self, db: Session, rack_id: str, kind: str) -> str:
+        """Takes one slot of the given rack.
+
+        Raises:
+            HTTPException: 404 if the rack does not exist, 400 if it is full.
+        """
+
+        self._ensure_loaded(db)
+        with self._lock:
+            rack = self._racks.get(rack_id)
+            if rack is None:
+                raise HTTPException(status_code=404, detail="Rack not found")
+            if self._free_slots(rack) <= 0:
+                raise HTTPException(status_code=400, detail="Rack capacity exceeded")
+            self._take(rack_id, kind)
+        return rack_id
+
+    def allocate(self, db: Session, kind: str, location: str | None = None) -> str:
+        """Takes one slot of the rack with the most free capacity.
+
+        Racks at `location` are preferred when given; other racks are only used
+        once those are full. Picking the emptiest rack every time spreads bulk
+        receipts evenly across racks.
+
+        Raises:
+            HTTPException: 400 if no rack has a free slot.
+        """
+
+        self._ensure_loaded(db)
+        with self._lock:
+            candidates = [
+                (
+                    location is not None and rack["location"] != location,
+                    -self._free_slots(rack),
+                    rack_id,
+                )
+                for rack_id, rack in self._racks.items()
+                if self._free_slots(rack) > 0
+            ]
+            if not candidates:
+                raise HTTPException(
+                    status_code=400, detail="No rack capacity available"
+                )
+            rack_id = min(candidates)[2]
+            self._take(rack_id, kind)
+        return rack_id
+
+    def confirm(self, rack_id: str | None, kind: str) -> None:
+        """Marks a reserved slot as committed, the database now counts it."""
+
+        with self._lock:
+            self._settle(rack_id, kind)
+
+    def cancel(self, rack_id: str | None, kind: str) -> None:
+        """Gives back a reserved slot whose write was rolled back."""
+
+        with self._lock:
+            if self._settle(rack_id, kind):
+                self.release(rack_id, kind)
+
+    def release(self, rack_id: str | None, kind: str) -> None:
+        """Gives back one slot of the given rack."""
+
+        with self._lock:
+            rack = self._racks.get(rack_id)
+            if rack is not None and rack[kind] > 0:
+                rack[kind] -= 1
+
+    def move(self, kind: str, from_rack_id: str | None, to_rack_id: str | None) -> None:
+        """Records a sample moving from one rack to another."""
+
+        if from_rack_id == to_rack_id:
+            return
+        with self._lock:
+            self.release(from_rack_id, kind)
+            rack = self._racks.get(to_rack_id)
+            if rack is not None:
+                rack[kind] += 1
+
+    def invalidate(self) -> None:
+        """Forces a reload from the database on next use."""
+
+        with self._lock:
+            self._racks = {}
+            self._expires_at = 0.0
+            self._generation += 1
+
+
+occupancy_index = RackOccupancyIndex()
+
+
+def sample_kind(SampleModel: SampleRetained | SampleReferenced) -> str:
+    """Returns the occupancy index counter updated by writes to `SampleModel`."""
+
+    if SampleModel.__tablename__ == "samples_retained":
+        return "retained"
+    return "referenced"
+
+
+def get_rack_occupancy(db: Session) -> List[schemas.RackOccupancy]:
+    """Returns the occupancy of every rack from the in-memory index.
+
+    Args:
+        db: A SQLAlchemy Session object, used only when the index is stale.
+
+    Returns:
+        The occupancy of every rack, ordered by rack id.
+    """
+
+    return occupancy_index.snapshot(db)
+
+
+def invalidate_rack_occupancy() -> None:
+    """Drops the rack occupancy index after a write that changes racks."""
+
+    occupancy_index.invalidate()
+
+
+def _count_by_rack(
+    db: Session,
+    SampleModel: SampleRetained | SampleReferenced,
+    rack_ids: List[str],
+    locking: bool = False,
+) -> dict[str, int]:
+    statement = (
+        select(SampleModel.rack_id, func.count())
+        .where(SampleModel.rack_id.in_(rack_ids))
+        .group_by(SampleModel.rack_id)
+    )
+    if locking:
+        # A locking read sees rows committed after the transaction's snapshot
+        statement = statement.with_for_update(read=True)
+    return dict(db.execute(statement).all())
+
+
+def lock_rack_capacity(db: Session, added: dict[str, int]) -> None:
+    """Checks in the database that racks have room for new samples.
+
+    The racks are locked with `SELECT ... FOR UPDATE` until the caller's
+    transaction ends, so writes to the same rack from any worker are checked
+    one after another. The occupancy index only picks racks, this check is
+    what keeps a rack from being overfilled.
+
+    Args:
+        db: A SQLAlchemy Session object, inside the write transaction.
+        added: Number of new samples per rack id.
+
+    Raises:
+        HTTPException: 404 if a rack does not exist, 400 if a rack is full.
+    """
+
+    if not added:
+        return
+
+    rack_ids = list(added)
+    capacity = dict(
+        db.execute(
+            select(Rack.rack_id, Rack.max_stored)
+            .where(Rack.rack_id.in_(rack_ids))
+            .with_for_update()
+        ).all()
+    )
+    retained = _count_by_rack(db, SampleRetained, rack_ids, locking=True)
+    referenced = _count_by_rack(db, SampleReferenced, rack_ids, locking=True)
+
+    for rack_id, count in added.items():
+        if rack_id not in capacity:
+            occupancy_index.invalidate()
+            raise HTTPException(status_code=404, detail="Rack not found")
+        stored = retained.get(rack_id, 0) + referenced.get(rack_id, 0)
+        if stored + count > capacity[rack_id]:
+            # The index of this worker missed writes made elsewhere
+            occupancy_index.invalidate()
+            raise HTTPException(status_code=400, detail="Rack capacity exceeded")
+
+
+def _move_first(
+    db: Session,
+    SampleModel: SampleRetained | SampleReferenced,
+    source: str,
+    target: str,
+    count: int,
+) -> int:
+    # The id of the last sample to move bounds a single range UPDATE, which the
+    # (rack_id, id) index of the rack foreign key serves directly
+    last_id = db.scalar(
+        select(SampleModel.id)
+        .where(SampleModel.rack_id == source)
+        .order_by(SampleModel.id)
+        .offset(count - 1)
+        .limit(1)
+    )
+    return db.execute(
+        update(SampleModel)
+        .where(SampleModel.rack_id == source, SampleModel.id <= last_id)
+        .values(rack_id=target)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+
+def transfer_samples(
+    db: Session, rack_id: str, transfer: schemas.RackTransfer
+) -> schemas.RackTransferResult:
+    """Moves samples off a rack onto one or more target racks in one transaction.
+
+    The racks involved are locked, capacity is checked once for the whole
+    transfer and samples are moved with set-based UPDATEs, retained samples
+    first, filling the targets in the given order.
+
+    Args:
+        db: A SQLAlchemy Session object.
+        rack_id: The rack to empty.
+        transfer: Target racks and the number of samples to move.
+
+    Returns:
+        The number of samples moved to every target rack.
+
+    Raises:
+        HTTPException: 404 if a rack does not exist, 400 if the targets do not
+            have enough free slots.
+    """
+    targets = list(dict.fromkeys(transfer.targets))
+    if rack_id in targets:
+        raise HTTPException(status_code=400, detail="Cannot transfer to the same rack")
+
+    rack_ids = [rack_id, *targets]
+    racks = {
+        rack.rack_id: rack
+        for rack in db.query(Rack)
+        .filter(Rack.rack_id.in_(rack_ids))
+        .order_by(Rack.rack_id)
+        .with_for_update()
+    }
+    if set(rack_ids) - set(racks):
+        raise HTTPException(status_code=404, detail="Rack not found")
+
+    counts = {
+        "retained": _count_by_rack(db, SampleRetained, rack_ids),
+        "referenced": _count_by_rack(db, SampleReferenced, rack_ids),
+    }
+    pending = {kind: counts[kind].get(rack_id, 0) for kind in counts}
+    if transfer.limit is not None:
+        pending["retained"] = min(pending["retained"], transfer.limit)
+        pending["referenced"] = min(
+            pending["referenced"], transfer.limit - pending["retained"]
+        )
+
+    free = {
+        target: max(
+            racks[target].max_stored
+            - counts["retained"].get(target, 0)
+            - counts["referenced"].get(target, 0),
+            0,
+        )
+        for target in targets
+    }
+    total = pending["retained"] + pending["referenced"]
+    if total > sum(free.values()):
+        raise HTTPException(status_code=400, detail="Rack capacity exceeded")
+
+    try:
+        moved = []
+        for target in targets:
+            move = {"retained": 0, "referenced": 0}
+            for kind, SampleModel in (
+                ("retained", SampleRetained),
+                ("referenced", SampleReferenced),
+            ):
+                count = min(pending[kind], free[target])
+                if count:
+                    move[kind] = _move_first(db, SampleModel, rack_id, target, count)
+                    pending[kind] -= move[kind]
+                    free[target] -= move[kind]
+            if move["retained"] or move["referenced"]:
+                moved.append(schemas.RackTransferMove(rack_id=target, **move))
+
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        occupancy_index.invalidate()
+
+    return schemas.RackTransferResult(
+        source=rack_id,
+        moved=moved,
+        total=sum(move.retained + move.referenced for move in moved),
+    )
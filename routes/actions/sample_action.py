@@ -1,17 +1,125 @@
+import time
+from collections import Counter
 from datetime import date
 from typing import List
 
 from fastapi import HTTPException
-from sqlalchemy import extract, func
-from sqlalchemy.orm import Session
+from sqlalchemy import (
+    delete,
+    func,
+    insert,
+    literal,
+    select,
+    union,
+    union_all,
+    update,
+)
+from sqlalchemy.orm import Session, contains_eager, joinedload
 
 from helpers import utils
-from helpers.utils import add_years_and_months
+from helpers.metrics import REPORT_RENDER_DURATION
+from helpers import partitions
+from helpers.utils import add_years_and_months, prefix_pattern
 from models import models
-from reports.pdf_generator import generate_destroy_report
-from routes.actions.rack import get_rack_by_id
+from routes.actions import product_action
+from routes.actions.rack import (
+    AUTO_RACK_ID,
+    lock_rack_capacity,
+    occupancy_index,
+    sample_kind,
+)
 from schemas import schemas
 
+RECOMPUTE_CHUNK_SIZE = 10_000
+
+# Columns samples can be listed by, each backed by an index
+SAMPLE_SORT_KEYS = (
+    "id",
+    "rack_id",
+    "product_code",
+    "batch_number",
+    "manufacturing_date",
+    "expiration_date",
+    "destroy_date",
+)
+
+# Destroy date is always 1 year and 1 month after the expiration date
+DESTROY_OFFSET_DAYS = utils.months_to_days(1, 1)
+
+
+def destroy_month(
+    SampleModel: models.SampleReferenced | models.SampleRetained,
+    month: int,
+    year: int,
+) -> list:
+    """Builds the conditions selecting samples destroyed in the given month.
+
+    A range on the raw `destroy_date` column, unlike `EXTRACT`, lets MySQL use
+    the index and prune every partition but the month's.
+
+    Args:
+        SampleModel: The sample table to filter.
+        month: Month of the destroy date.
+        year: Year of the destroy date.
+
+    Returns:
+        The filter conditions.
+    """
+    start = date(year, month, 1)
+    return [
+        SampleModel.destroy_date >= start,
+        SampleModel.destroy_date < partitions.next_month(start),
+    ]
+
+
+def to_sample_product_join(sample) -> schemas.SampleProductJoin:
+    """Flattens a sample and its eagerly loaded product into one row.
+
+    Args:
+        sample: A sample loaded together with its `product` relationship.
+
+    Returns:
+        The sample details merged with the product details.
+    """
+    return schemas.SampleProductJoin(
+        id=sample.id,
+        product_code=sample.product_code,
+        batch_number=sample.batch_number,
+        manufacturing_date=sample.manufacturing_date,
+        expiration_date=sample.expiration_date,
+        destroy_date=sample.destroy_date,
+        rack_id=sample.rack_id if sample.rack_id else "",
+        product_name=sample.product.product_name,
+        product_type=sample.product.product_type,
+        package=sample.product.package,
+        shelf_life=sample.product.shelf_life,
+    )
+
+
+def to_destroyed_sample(sample) -> schemas.DestroyedSample:
+    """Flattens a history row and its product, which may have been deleted since.
+
+    Args:
+        sample: A history row loaded together with its `product` relationship.
+
+    Returns:
+        The sample details merged with the product details, if any.
+    """
+    product = sample.product
+    return schemas.DestroyedSample(
+        id=sample.id,
+        product_code=sample.product_code,
+        batch_number=sample.batch_number,
+        manufacturing_date=sample.manufacturing_date,
+        expiration_date=sample.expiration_date,
+        destroy_date=sample.destroy_date,
+        rack_id=sample.rack_id if sample.rack_id else "",
+        product_name=product.product_name if product else None,
+        product_type=product.product_type if product else None,
+        package=product.package if product else None,
+        shelf_life=product.shelf_life if product else None,
+    )
+
 
 def get_sample_by_id(
     db: Session,
@@ -19,16 +127,16 @@ def get_sample_by_id(
     SampleModel: models.SampleReferenced | models.SampleRetained,
 ):
     sample = (
-        db.query(SampleModel, models.Product)
-        .join(models.Product)
+        db.query(SampleModel)
+        .options(joinedload(SampleModel.product))
         .filter(SampleModel.id == id)
-        .one()
+        .first()
     )
 
     if not sample:
         raise HTTPException(status_code=404, detail="Sample not found")
 
-    return sample
+    return [sample]
 
 
 def get_all_sample(
@@ -36,24 +144,177 @@ def get_all_sample(
     skip: int,
     limit: int,
     SampleModel: models.SampleReferenced | models.SampleRetained,
+    filters: schemas.SampleFilter | None = None,
 ):
-    samples = db.query(SampleModel).offset(skip).limit(limit).all()
+    """Lists one page of samples matching the given filters.
+
+    Every filter compares an indexed column, date windows are closed ranges
+    on the raw column so they stay sargable. The total number of matches is
+    computed by a `COUNT(*) OVER ()` window in the same statement, so a page
+    and its total cost a single round trip.
+
+    Args:
+        db: A SQLAlchemy Session object.
+        skip: Number of samples to skip.
+        limit: Maximum number of samples to retrieve.
+        SampleModel: The sample table to list.
+        filters: Rack, product, type and date filters and the sort order.
+
+    Returns:
+        The samples of the page, with their product loaded, and the total
+        number of matching samples.
+    """
+    filters = filters or schemas.SampleFilter()
+
+    conditions = [
+        column == value
+        for column, value in (
+            (SampleModel.rack_id, filters.rack_id),
+            (SampleModel.product_code, filters.product_code),
+            (models.Product.product_type, filters.product_type),
+        )
+        if value is not None
+    ]
+    for column, start, end in (
+        (
+            SampleModel.manufacturing_date,
+            filters.manufactured_from,
+            filters.manufactured_to,
+        ),
+        (SampleModel.expiration_date, filters.expires_from, filters.expires_to),
+        (SampleModel.destroy_date, filters.destroy_from, filters.destroy_to),
+    ):
+        if start is not None:
+            conditions.append(column >= start)
+        if end is not None:
+            conditions.append(column <= end)
+
+    # Load the products in the same query instead of one query per sample
+    query = (
+        db.query(SampleModel, func.count().over().label("total"))
+        .outerjoin(SampleModel.product)
+        .options(contains_eager(SampleModel.product))
+        .filter(*conditions)
+        .order_by(*_sort_columns(filters.sort, SampleModel))
+    )
+    rows = query.offset(skip).limit(limit).all()
+
+    if rows:
+        total = rows[0].total
+    elif skip:
+        # Past the last page the window has no row to report the total on
+        total = (
+            db.query(func.count(SampleModel.id))
+            .outerjoin(SampleModel.product)
+            .filter(*conditions)
+            .scalar()
+        )
+    else:
+        total = 0
+
+    return [sample for sample, _ in rows], total
+
+
+def _sort_columns(
+    sort: str, SampleModel: models.SampleReferenced | models.SampleRetained
+) -> list:
+    columns = []
+    for key in sort.split(","):
+        key = key.strip()
+        name = key.lstrip("-")
+        if name not in SAMPLE_SORT_KEYS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown sort key {name}, use one of "
+                + ", ".join(SAMPLE_SORT_KEYS),
+            )
+        column = getattr(SampleModel, name)
+        columns.append(column.desc() if key.startswith("-") else column.asc())
 
-    return samples
+    # Tie-break on the primary key so pages never overlap
+    if "id" not in {key.strip().lstrip("-") for key in sort.split(",")}:
+        columns.append(SampleModel.id.asc())
+    return columns
 
 
-def create_sample(
+def search_samples(
     db: Session,
-    sample: schemas.SampleCreate | schemas.Sample,
+    q: str,
+    limit: int,
     SampleModel: models.SampleReferenced | models.SampleRetained,
 ):
-    # Retrieve the product information from the database
-    product = (
-        db.query(models.Product)
-        .filter(models.Product.product_code == sample.product_code)
-        .first()
+    """Finds samples by the prefix of their batch number, product code or name.
+
+    Matching products are resolved first. The newest samples are then taken
+    separately by batch number and for every matching product, each from an
+    index and limited to `limit` rows, and only those candidates are merged.
+    A single `OR` condition would read and sort every matching sample instead.
+
+    Args:
+        db: A SQLAlchemy Session object.
+        q: The text the batch number, product code or product name starts with.
+        limit: Maximum number of samples returned.
+        SampleModel: The sample table to search.
+
+    Returns:
+        The matching samples, newest first, with their product loaded.
+    """
+    conditions = [SampleModel.batch_number.like(prefix_pattern(q), escape="\\")]
+    # One condition per product, so each is read newest first from the
+    # (product_code, id) index without sorting
+    conditions.extend(
+        SampleModel.product_code == product_code
+        for product_code in product_action.find_product_codes(db, q)
+    )
+
+    newest = [
+        select(SampleModel.id)
+        .where(condition)
+        .order_by(SampleModel.id.desc())
+        .limit(limit)
+        .subquery()
+        for condition in conditions
+    ]
+    candidates = union(*(select(ids.c.id) for ids in newest)).subquery()
+
+    samples = (
+        db.query(SampleModel)
+        .join(candidates, candidates.c.id == SampleModel.id)
+        .options(joinedload(SampleModel.product))
+        .order_by(SampleModel.id.desc())
+        .limit(limit)
+        .all()
     )
 
+    return samples
+
+
+def _assign_rack(
+    db: Session,
+    sample: schemas.SampleCreate | schemas.Sample,
+    SampleModel: models.SampleReferenced | models.SampleRetained,
+) -> str | None:
+    kind = sample_kind(SampleModel)
+
+    # Let the occupancy index pick the emptiest rack
+    if sample.rack_id == AUTO_RACK_ID:
+        return occupancy_index.allocate(
+            db, kind, location=getattr(sample, "location", None)
+        )
+
+    # Check if capacity available on the requested rack
+    if sample.rack_id:
+        return occupancy_index.reserve(db, sample.rack_id, kind)
+
+    return None
+
+
+def _build_sample(
+    db: Session,
+    sample: schemas.SampleCreate | schemas.Sample,
+    product: schemas.Product | None,
+    SampleModel: models.SampleReferenced | models.SampleRetained,
+):
     # Check if the product exists
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
@@ -66,46 +327,73 @@ def create_sample(
     # Calculate the destroy date by adding 1 year and 1 months to the expiration date
     destroy_date = add_years_and_months(expiration_date, 1, 1)
 
-    if sample.rack_id:
-        rack = get_rack_by_id(db, sample.rack_id)
-        if rack.max_stored > len(rack.retained_sample):  # Check if capacity available
-            new_sample = SampleModel(
-                product_code=sample.product_code,
-                batch_number=sample.batch_number,
-                manufacturing_date=sample.manufacturing_date,
-                rack_id=sample.rack_id,
-                expiration_date=expiration_date,
-                destroy_date=destroy_date,
-            )
-
-            # Add the new sample to the database session and commit the transaction
-            db.add(new_sample)
-            db.commit()
-
-            # Refresh the object to ensure it reflects the latest state in the database
-            db.refresh(new_sample)
-
-            return new_sample
-        else:
-            raise HTTPException(status_code=400, detail="Rack capacity exceeded")
-
-    new_sample = SampleModel(
+    return SampleModel(
         product_code=sample.product_code,
         batch_number=sample.batch_number,
         manufacturing_date=sample.manufacturing_date,
-        rack_id=sample.rack_id,
+        rack_id=_assign_rack(db, sample, SampleModel),
         expiration_date=expiration_date,
         destroy_date=destroy_date,
     )
 
-    # Add the new sample to the database session and commit the transaction
-    db.add(new_sample)
-    db.commit()
 
-    # Refresh the object to ensure it reflects the latest state in the database
-    db.refresh(new_sample)
+def create_samples_bulk(
+    db: Session,
+    samples: List[schemas.SampleCreate],
+    SampleModel: models.SampleReferenced | models.SampleRetained,
+):
+    """Stores a whole receipt of samples in a single transaction.
+
+    Racks are assigned from the in-memory occupancy index, so samples with
+    `rack_id` set to `auto` are spread across the emptiest racks. The products
+    and the chosen racks are then checked in the database and locked until
+    commit, so neither can be deleted or overfilled meanwhile.
+    """
+    new_samples = []
+    try:
+        products = product_action.lock_products(
+            db, list({sample.product_code for sample in samples})
+        )
+        for sample in samples:
+            new_samples.append(
+                _build_sample(
+                    db, sample, products.get(sample.product_code), SampleModel
+                )
+            )
+
+        lock_rack_capacity(
+            db, Counter(sample.rack_id for sample in new_samples if sample.rack_id)
+        )
+
+        # Add the new samples to the database session and commit the transaction
+        db.add_all(new_samples)
+        db.commit()
+    except Exception:
+        # Give back the slots reserved for samples that were not stored
+        db.rollback()
+        for new_sample in new_samples:
+            occupancy_index.cancel(new_sample.rack_id, sample_kind(SampleModel))
+        raise
+
+    for new_sample in new_samples:
+        occupancy_index.confirm(new_sample.rack_id, sample_kind(SampleModel))
+
+    # Refresh the objects to ensure they reflect the latest state in the database
+    for new_sample in new_samples:
+        db.refresh(new_sample)
+
+    return new_samples
+
+
+def create_sample(
+    db: Session,
+    sample: schemas.SampleCreate | schemas.Sample,
+    SampleModel: models.SampleReferenced | models.SampleRetained,
+):
+    new_samples = create_samples_bulk(db, [sample], SampleModel)
+
     # Return the details of the created sample
-    return new_sample
+    return new_samples[0]
 
 
 def update_sample(
@@ -116,26 +404,47 @@ def update_sample(
 ):
     # Retrieve the sample from the database
     existing_sample = db.query(SampleModel).filter(SampleModel.id == id)
-    if existing_sample is None:
-        raise HTTPException(status_code=404, detail="Retained sample not found")
+    current = existing_sample.first()
+    if current is None:
+        raise HTTPException(status_code=404, detail="Sample not found")
 
-    original_rack_id = existing_sample.first().rack_id
+    kind = sample_kind(SampleModel)
+    original_rack_id = current.rack_id
     new_rack_id = updated_sample.rack_id
 
+    # Check capacity of the new rack (if provided) against the occupancy index,
+    # then against the database with the rack locked
+    moved = bool(new_rack_id) and new_rack_id != original_rack_id
+    if moved:
+        occupancy_index.reserve(db, new_rack_id, kind)
+
+    try:
+        # The sample tables have no foreign keys, check the new product here
+        if updated_sample.product_code and not product_action.lock_products(
+            db, [updated_sample.product_code]
+        ):
+            raise HTTPException(status_code=404, detail="Product not found")
+
+        if moved:
+            lock_rack_capacity(db, {new_rack_id: 1})
+
+        # Update sample attributes
+        existing_sample.update(updated_sample.model_dump())
+
+        # Commit the transaction to save the changes
+        db.commit()
+    except Exception:
+        db.rollback()
+        if moved:
+            occupancy_index.cancel(new_rack_id, kind)
+        raise
+
+    if moved:
+        occupancy_index.confirm(new_rack_id, kind)
+
+    # The sample left its previous rack
     if new_rack_id != original_rack_id:
-        # Check capacity of the new rack (if provided)
-        if new_rack_id:
-            new_rack = get_rack_by_id(db, new_rack_id)
-            if new_rack and new_rack.max_stored <= len(new_rack.retained_sample) + len(
-                new_rack.referenced_sample
-            ):
-                raise HTTPException(status_code=400, detail="Rack capacity exceeded")
-
-    # Update sample attributes
-    existing_sample.update(updated_sample.model_dump())
-
-    # Commit the transaction to save the changes
-    db.commit()
+        occupancy_index.release(original_rack_id, kind)
 
     # Return the updated sample
     return updated_sample
@@ -148,14 +457,84 @@ def delete_sample(
     if sample_to_delete is None:
         raise HTTPException(status_code=404, detail="Sample not found")
 
+    rack_id = sample_to_delete.rack_id
+
     # Delete the sample from the database
     db.delete(sample_to_delete)
     db.commit()
+    occupancy_index.release(rack_id, sample_kind(SampleModel))
 
     # Return the details of the deleted sample
     return sample_to_delete
 
 
+def delete_samples_of(db: Session, **criteria) -> int:
+    """
+    Deletes the samples of both tables matching `criteria`, e.g. every sample of
+    a product before the product itself is deleted.
+
+    Parent relationships use `passive_deletes`, so the samples are not loaded;
+    each table is cleared with a single DELETE instead. The sample tables are
+    partitioned on MySQL and carry no foreign keys to cascade from.
+
+    Every sample refers to an existing product, and to an existing rack or
+    none. Without foreign keys that only holds because sample writes lock
+    their product and rack (`lock_products`, `lock_rack_capacity`) and a
+    parent is locked, then deleted together with its samples through this
+    function. `find_orphan_samples` checks the invariant.
+
+    Args:
+        db: Database session
+        **criteria: The parent whose samples are deleted, either
+            `product_code="P1"` or `rack_id="A1"`
+
+    Returns:
+        Number of deleted samples
+    """
+
+    assert len(criteria) == 1 and set(criteria) <= {
+        "product_code",
+        "rack_id",
+    }, "Samples are only deleted together with their product or rack"
+
+    deleted = 0
+    for SampleModel in (models.SampleRetained, models.SampleReferenced):
+        deleted += db.execute(
+            delete(SampleModel).filter_by(**criteria),
+            execution_options={"synchronize_session": False},
+        ).rowcount
+    return deleted
+
+
+def find_orphan_samples(db: Session) -> dict[str, dict[str, int]]:
+    """Counts the samples whose product or rack does not exist.
+
+    The sample tables have no foreign keys, so this is how writes that skip
+    the application's checks, e.g. raw SQL or scripts, are noticed.
+
+    Args:
+        db: A SQLAlchemy Session object.
+
+    Returns:
+        The number of samples without product and without rack, per table.
+    """
+    orphans = {}
+    for SampleModel in (models.SampleRetained, models.SampleReferenced):
+        counts = {}
+        for column, ParentModel, key in (
+            (SampleModel.product_code, models.Product, models.Product.product_code),
+            (SampleModel.rack_id, models.Rack, models.Rack.rack_id),
+        ):
+            counts[ParentModel.__tablename__] = db.scalar(
+                select(func.count())
+                .select_from(SampleModel)
+                .outerjoin(ParentModel, key == column)
+                .where(column.is_not(None), key.is_(None))
+            )
+        orphans[SampleModel.__tablename__] = counts
+    return orphans
+
+
 def get_destroy_by_month_year(
     db: Session,
     month: int,
@@ -164,46 +543,212 @@ def get_destroy_by_month_year(
     SampleModel: models.SampleReferenced | models.SampleRetained,
 ):
     samples = (
-        db.query(
-            SampleModel,
-        )
-        .join(models.Product)
-        .filter(extract("year", SampleModel.destroy_date) == year)
-        .filter(extract("month", SampleModel.destroy_date) == month)
+        db.query(SampleModel)
+        .join(SampleModel.product)
+        .options(contains_eager(SampleModel.product))
+        .filter(*destroy_month(SampleModel, month, year))
         .filter(models.Product.product_type == product_type)
         .all()
     )
 
-    if samples is None:
-        raise HTTPException(status_code=404, detail="No sample found")
+    return [to_sample_product_join(sample) for sample in samples]
 
-    samples = [
-        schemas.SampleProductJoin(
-            id=sample.id,
-            product_code=sample.product_code,
-            batch_number=sample.batch_number,
-            manufacturing_date=sample.manufacturing_date,
-            expiration_date=sample.expiration_date,
-            destroy_date=sample.destroy_date,
-            rack_id=sample.rack_id,
-            product_name=sample.product.product_name,
-            product_type=sample.product.product_type,
-            package=sample.product.package,
-            shelf_life=sample.product.shelf_life,
+
+def history_model(
+    SampleModel: models.SampleReferenced | models.SampleRetained,
+) -> models.SampleReferencedHistory | models.SampleRetainedHistory:
+    """Returns the history table destroyed samples of `SampleModel` move to."""
+
+    if SampleModel.__tablename__ == models.SampleRetained.__tablename__:
+        return models.SampleRetainedHistory
+    return models.SampleReferencedHistory
+
+
+def mark_destroyed(
+    db: Session,
+    month: int,
+    year: int,
+    product_type: str,
+    SampleModel: models.SampleReferenced | models.SampleRetained,
+) -> schemas.DestroyedResult:
+    """Moves the samples of an executed destroy report into the history table.
+
+    The samples are copied with one `INSERT ... SELECT` and removed with one
+    `DELETE` in the same transaction, so live listings, occupancy and destroy
+    queries stop seeing them while their history stays queryable.
+
+    Args:
+        db: A SQLAlchemy Session object.
+        month: Month of the destroy date of the report.
+        year: Year of the destroy date of the report.
+        product_type: Product type of the report.
+        SampleModel: The sample table of the report.
+
+    Returns:
+        The number of samples moved to the history table.
+    """
+    HistoryModel = history_model(SampleModel)
+    columns = [
+        "id",
+        "rack_id",
+        "product_code",
+        "batch_number",
+        "manufacturing_date",
+        "expiration_date",
+        "destroy_date",
+    ]
+
+    conditions = [
+        *destroy_month(SampleModel, month, year),
+        SampleModel.product_code.in_(
+            select(models.Product.product_code).where(
+                models.Product.product_type == product_type
+            )
+        ),
+    ]
+    destroyed = select(*(getattr(SampleModel, column) for column in columns)).where(
+        *conditions
+    )
+    # Only rows that made it into the history table are removed
+    archived = select(HistoryModel.id).where(*destroy_month(HistoryModel, month, year))
+
+    try:
+        moved = db.execute(
+            insert(HistoryModel).from_select(columns, destroyed)
+        ).rowcount
+        db.execute(
+            delete(SampleModel)
+            .where(*conditions, SampleModel.id.in_(archived))
+            .execution_options(synchronize_session=False)
         )
-        for sample in samples
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    # Freed slots are picked up on the next occupancy load
+    occupancy_index.invalidate()
+
+    return schemas.DestroyedResult(
+        month=month, year=year, product_type=product_type, moved=moved
+    )
+
+
+def get_destroyed_samples(
+    db: Session,
+    skip: int,
+    limit: int,
+    SampleModel: models.SampleReferenced | models.SampleRetained,
+    product_code: str | None = None,
+    destroy_from: date | None = None,
+    destroy_to: date | None = None,
+):
+    """Lists destroyed samples from the history table, newest destroy date first.
+
+    Args:
+        db: A SQLAlchemy Session object.
+        skip: Number of samples to skip.
+        limit: Maximum number of samples to retrieve.
+        SampleModel: The live sample table whose history is listed.
+        product_code: Only samples of this product.
+        destroy_from: Only samples destroyed on or after this date.
+        destroy_to: Only samples destroyed on or before this date.
+
+    Returns:
+        The destroyed samples with their product loaded, or None in place of a
+        product that was deleted.
+    """
+    HistoryModel = history_model(SampleModel)
+    query = db.query(HistoryModel).options(joinedload(HistoryModel.product))
+    if product_code is not None:
+        query = query.filter(HistoryModel.product_code == product_code)
+    if destroy_from is not None:
+        query = query.filter(HistoryModel.destroy_date >= destroy_from)
+    if destroy_to is not None:
+        query = query.filter(HistoryModel.destroy_date <= destroy_to)
+
+    return (
+        query.order_by(HistoryModel.destroy_date.desc(), HistoryModel.id.desc())
+        .offset(skip)
+        .limit(limit)
+        .all()
+    )
+
+
+def get_destroy_all_types(
+    db: Session, month: int, year: int, product_type: str
+) -> List[schemas.SampleDestroyJoin]:
+    """Lists retained and referenced samples to destroy in one round trip.
+
+    Both tables are filtered on their destroy date range, merged with
+    `UNION ALL` and joined with the products once.
+
+    Args:
+        db: A SQLAlchemy Session object.
+        month: Month of the destroy date.
+        year: Year of the destroy date.
+        product_type: Product type of the samples.
+
+    Returns:
+        The samples of both types, each tagged with its `sample_type`.
+    """
+    branches = [
+        select(
+            SampleModel.id,
+            SampleModel.product_code,
+            SampleModel.batch_number,
+            SampleModel.manufacturing_date,
+            SampleModel.expiration_date,
+            SampleModel.destroy_date,
+            SampleModel.rack_id,
+            literal(sample_kind(SampleModel)).label("sample_type"),
+        ).where(*destroy_month(SampleModel, month, year))
+        for SampleModel in (models.SampleRetained, models.SampleReferenced)
     ]
-    return samples
+    samples = union_all(*branches).subquery()
 
+    rows = db.execute(
+        select(
+            samples,
+            models.Product.product_name,
+            models.Product.product_type,
+            models.Product.package,
+            models.Product.shelf_life,
+        )
+        .join(models.Product, models.Product.product_code == samples.c.product_code)
+        .where(models.Product.product_type == product_type)
+        .order_by(samples.c.sample_type.desc(), samples.c.id)
+    ).all()
+
+    return [
+        schemas.SampleDestroyJoin(
+            **{**row._mapping, "rack_id": row.rack_id if row.rack_id else ""}
+        )
+        for row in rows
+    ]
 
-def create_destroy_reports(
+
+def get_destroy_report_rows(
     db: Session,
     month: int,
     year: int,
     product_type: str,
     packageWeight: List[schemas.DestroySampleWeight],
     SampleModel: models.SampleReferenced | models.SampleRetained,
-):
+) -> List[schemas.DestroyObject]:
+    """Groups the samples to destroy by product, as printed on the report.
+
+    Args:
+        db: A SQLAlchemy Session object.
+        month: Month of the destroy date.
+        year: Year of the destroy date.
+        product_type: Product type of the report.
+        packageWeight: Weight to print for each product code.
+        SampleModel: The sample table of the report.
+
+    Returns:
+        One row per product with its batch numbers merged.
+    """
     # Retrieve details for each sample
     samples = (
         db.query(
@@ -218,14 +763,12 @@ def create_destroy_reports(
             func.group_concat(SampleModel.batch_number).label("batch_numbers"),
         )
         .join(models.Product)
-        .filter(extract("year", SampleModel.destroy_date) == year)
-        .filter(extract("month", SampleModel.destroy_date) == month)
+        .filter(*destroy_month(SampleModel, month, year))
         .filter(models.Product.product_type == product_type)
         .group_by(SampleModel.product_code)
         .all()
     )
 
-    report_date = date(year, month, 1)
     if samples is None:
         raise HTTPException(status_code=404, detail="No sample found")
 
@@ -250,12 +793,200 @@ def create_destroy_reports(
                 sample.weight = item.weight
                 break  # Break once the product_code is found
 
-    pdf, file_path = generate_destroy_report(
-        samples=merged_samples,
-        date=report_date,
-        product_type=product_type,
-        SampleModel=SampleModel,
+    return merged_samples
+
+
+def create_destroy_reports(
+    db: Session,
+    month: int,
+    year: int,
+    product_type: str,
+    packageWeight: List[schemas.DestroySampleWeight],
+    SampleModel: models.SampleReferenced | models.SampleRetained,
+):
+    merged_samples = get_destroy_report_rows(
+        db, month, year, product_type, packageWeight, SampleModel
     )
+    report_date = date(year, month, 1)
+
+    # The PDF stack (fpdf, fontTools, Pillow) is only imported on first report
+    from reports.pdf_generator import generate_destroy_report
+
+    with REPORT_RENDER_DURATION.time(sample_kind(SampleModel)):
+        pdf, file_path = generate_destroy_report(
+            samples=merged_samples,
+            date=report_date,
+            product_type=product_type,
+            SampleModel=SampleModel,
+        )
+        content = bytes(pdf.output())
     headers = {"Content-Disposition": f"attachment; filename={file_path}"}
 
-    return pdf, headers
+    return content, headers
+
+
+def create_combined_destroy_report(
+    db: Session,
+    month: int,
+    year: int,
+    product_type: str,
+    weights: schemas.CombinedDestroyWeight,
+):
+    """Renders the retained and referenced destroy reports as one document.
+
+    Args:
+        db: A SQLAlchemy Session object.
+        month: Month of the destroy date.
+        year: Year of the destroy date.
+        product_type: Product type of the report.
+        weights: Weight to print for each product code, per sample type.
+
+    Returns:
+        The PDF content and the response headers to download it with.
+    """
+    sections = [
+        (
+            SampleModel,
+            get_destroy_report_rows(
+                db, month, year, product_type, packageWeight, SampleModel
+            ),
+        )
+        for SampleModel, packageWeight in (
+            (models.SampleRetained, weights.retained),
+            (models.SampleReferenced, weights.referenced),
+        )
+    ]
+
+    from reports.pdf_generator import generate_combined_destroy_report
+
+    with REPORT_RENDER_DURATION.time("combined"):
+        pdf, file_path = generate_combined_destroy_report(
+            sections=sections,
+            date=date(year, month, 1),
+            product_type=product_type,
+        )
+        content = bytes(pdf.output())
+    headers = {"Content-Disposition": f"attachment; filename={file_path}"}
+
+    return content, headers
+
+
+def recompute_sample_dates(
+    db: Session,
+    SampleModel: models.SampleReferenced | models.SampleRetained,
+    product_code: str | None = None,
+    chunk_size: int = RECOMPUTE_CHUNK_SIZE,
+    commit_chunks: bool = False,
+) -> int:
+    """Recalculates expiration and destroy dates from the product shelf life.
+
+    The dates are rewritten with set-based `UPDATE ... JOIN products` statements
+    over consecutive id ranges, so no sample is loaded into the session. The
+    arithmetic mirrors `add_years_and_months`.
+
+    Args:
+        db: A SQLAlchemy Session object.
+        SampleModel: The sample table to update.
+        product_code: Only update samples of this product, or every sample if None.
+        chunk_size: Width of the id range updated by a single statement.
+        commit_chunks: Commit after every chunk instead of leaving the
+            transaction open for the caller.
+
+    Returns:
+        The number of rows updated.
+    """
+    bounds = db.query(func.min(SampleModel.id), func.max(SampleModel.id))
+    if product_code:
+        bounds = bounds.filter(SampleModel.product_code == product_code)
+    low, high = bounds.one()
+    if low is None:
+        return 0
+
+    expiry_days = (
+        func.truncate(models.Product.shelf_life * 12, 0) * utils.DAYS_PER_MONTH
+    )
+    base_statement = (
+        update(SampleModel)
+        .where(SampleModel.product_code == models.Product.product_code)
+        .values(
+            expiration_date=func.adddate(SampleModel.manufacturing_date, expiry_days),
+            destroy_date=func.adddate(
+                SampleModel.manufacturing_date, expiry_days + DESTROY_OFFSET_DAYS
+            ),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    if product_code:
+        base_statement = base_statement.where(SampleModel.product_code == product_code)
+
+    updated = 0
+    for start in range(low, high + 1, chunk_size):
+        statement = base_statement.where(
+            SampleModel.id.between(start, start + chunk_size - 1)
+        )
+        updated += db.execute(statement).rowcount
+        if commit_chunks:
+            db.commit()
+
+    return updated
+
+
+def recompute_all_sample_dates(
+    db: Session, chunk_size: int = RECOMPUTE_CHUNK_SIZE
+) -> schemas.RecomputeResult:
+    """Rebuilds every expiration and destroy date in both sample tables.
+
+    Each chunk is committed on its own so the job never holds long locks.
+
+    Args:
+        db: A SQLAlchemy Session object.
+        chunk_size: Width of the id range updated by a single statement.
+
+    Returns:
+        Updated row counts and the measured throughput.
+    """
+    started = time.perf_counter()
+    retained = recompute_sample_dates(
+        db, models.SampleRetained, chunk_size=chunk_size, commit_chunks=True
+    )
+    referenced = recompute_sample_dates(
+        db, models.SampleReferenced, chunk_size=chunk_size, commit_chunks=True
+    )
+    elapsed = time.perf_counter() - started
+
+    return schemas.RecomputeResult(
+        retained=retained,
+        referenced=referenced,
+        elapsed_seconds=round(elapsed, 3),
+        rows_per_second=round((retained + referenced) / elapsed, 1) if elapsed else 0,
+    )
+
+
+def extend_partitions(db: Session, months_ahead: int = 60) -> List[str]:
+    """Creates the monthly destroy date partitions of both sample tables.
+
+    Partitions are created up to `months_ahead` months from now, or up to the
+    latest destroy date already stored if that lies further ahead.
+
+    Args:
+        db: A SQLAlchemy Session object.
+        months_ahead: Number of months after the current one to prepare.
+
+    Returns:
+        Names of the created partitions, prefixed with their table.
+    """
+    created = []
+    for SampleModel in (models.SampleRetained, models.SampleReferenced):
+        until = date.today()
+        for _ in range(months_ahead):
+            until = partitions.next_month(until)
+        latest = db.scalar(select(func.max(SampleModel.destroy_date)))
+        if latest and latest > until:
+            until = latest
+
+        table = SampleModel.__tablename__
+        created.extend(
+            f"{table}.{name}"
+            for name in partitions.add_monthly_partitions(db, table, until)
+        )
+    return created
@@ -1,12 +1,14 @@
+from datetime import datetime
 from typing import List
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import FileResponse, StreamingResponse
 from sqlalchemy.orm import Session
 
 from config.db import SessionLocal
-from models import models
+from helpers.audit_archive import audit_archive
 from routes.actions import audit_action, auth_action
-from schemas import audit_schemas, schemas
+from schemas import audit_schemas
 
 audit_router = APIRouter(
     prefix="/audit", tags=["Audit"], dependencies=[Depends(auth_action.is_admin)]
@@ -41,19 +43,90 @@ def get_audit_log(
 
 @audit_router.delete(
     "/",
-    response_model=schemas.Sample,
+    response_model=audit_schemas.AuditPurgeResult,
     description="Clear log",
 )
-def clear_all_log(db: Session = Depends(get_db)):
+def clear_all_log(older_than_days: int | None = None, db: Session = Depends(get_db)):
     """
-    Clear all log
+    Clear the log, or only the entries older than the given number of days
 
+    :param older_than_days: Keep entries younger than this many days
     :param db: Database session dependency
-    :return: Details of the deleted reference sample
+    :return: Dropped partitions and number of deleted entries
     """
-    deleted_sample = audit_action.delete_sample(
-        db, id, SampleModel=models.SampleReferenced
+    if older_than_days is None:
+        return audit_action.clear_all_log(db)
+
+    return audit_action.purge_log(db, older_than_days=older_than_days)
+
+
+@audit_router.post(
+    "/archive",
+    response_model=List[audit_schemas.ArchiveSegment],
+    description="Archive old log entries",
+)
+def archive_log(
+    older_than_days: int = audit_action.AUDIT_RETENTION_DAYS,
+    db: Session = Depends(get_db),
+):
+    """
+    Copy log entries older than the given number of days to compressed archive segments
+
+    :param older_than_days: Archive entries older than this many days
+    :param db: Database session dependency
+    :return: The segments that were written
+    """
+    return audit_action.archive_log(db, older_than_days=older_than_days)
+
+
+@audit_router.get(
+    "/archive",
+    response_model=List[audit_schemas.ArchiveSegment],
+    description="List archived log segments",
+)
+def get_archive_segments():
+    """
+    List the archived log segments with their id and time ranges
+
+    :return: Index of the archive
+    """
+    return audit_archive.segments()
+
+
+@audit_router.get("/archive/search", description="Search archived log entries")
+def search_archive(
+    start: datetime | None = None,
+    end: datetime | None = None,
+    query: str = "",
+    limit: int | None = 1000,
+):
+    """
+    Stream archived log entries as JSON lines, without loading them back into the database
+
+    :param start: Only entries logged at or after this time
+    :param end: Only entries logged before this time
+    :param query: Text the url, user or request must contain
+    :param limit: Maximum number of entries returned
+    :return: Matching entries, one JSON object per line
+    """
+    return StreamingResponse(
+        audit_archive.search(start=start, end=end, query=query, limit=limit),
+        media_type="application/x-ndjson",
     )
 
-    # Return the details of the deleted reference sample
-    return deleted_sample
+
+@audit_router.get("/archive/{segment:path}", description="Download a log segment")
+def download_archive_segment(segment: str):
+    """
+    Download one archived segment as gzipped JSON lines
+
+    :param segment: Segment name as listed in the archive index
+    :return: The compressed segment file
+    """
+    path = audit_archive.segment_path(segment)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Archive segment not found")
+
+    return FileResponse(
+        path, media_type="application/gzip", filename=segment.rsplit("/", 1)[-1]
+    )
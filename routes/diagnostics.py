@@ -0,0 +1,69 @@
+from typing import List
+
+from fastapi import APIRouter, Depends
+
+from config.db import get_engine_settings, replica_monitor
+from helpers.metrics import pool_status
+from helpers.slow_queries import slow_query_log
+from routes.actions import auth_action
+from schemas import diagnostics_schemas
+
+diagnostics_router = APIRouter(
+    prefix="/diagnostics",
+    tags=["Diagnostics"],
+    dependencies=[Depends(auth_action.is_admin)],
+)
+
+
+@diagnostics_router.get(
+    "/slow-queries",
+    response_model=List[diagnostics_schemas.SlowQuery],
+    description="Get the slowest statements seen by this worker",
+)
+def get_slow_queries():
+    """
+    Retrieve the slowest statements over the slow query threshold, slowest first, with admin role
+
+    :return: Statement, parameters, duration, calling route and EXPLAIN plan of every slow query
+    """
+    return slow_query_log.entries()
+
+
+@diagnostics_router.delete(
+    "/slow-queries",
+    description="Clear the slow query log of this worker",
+)
+def clear_slow_queries():
+    """
+    Clear the slow query log with admin role
+    """
+    slow_query_log.clear()
+    return {"message": "Slow query log cleared"}
+
+
+@diagnostics_router.get(
+    "/pool",
+    response_model=diagnostics_schemas.PoolDiagnostics,
+    description="Get the connection pool state and checkout statistics of this worker",
+)
+def get_pool_status():
+    """
+    Retrieve the engine settings and the live state of every connection pool, with admin role
+
+    :return: Pool settings, and per database the connections in use, waits, timeouts and invalidations
+    """
+    return {"settings": get_engine_settings(), "pools": pool_status()}
+
+
+@diagnostics_router.get(
+    "/replica",
+    response_model=diagnostics_schemas.ReplicaStatus,
+    description="Get the replication lag of the read replica",
+)
+def get_replica_status():
+    """
+    Retrieve whether read-only requests are served by the replica, with admin role
+
+    :return: Last measured lag, the lag threshold and the error of the last check, if any
+    """
+    return replica_monitor.status()
@@ -0,0 +1,22 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from helpers.metrics import render_metrics
+
+metrics_router = APIRouter(tags=["metrics"])
+
+
+@metrics_router.get(
+    "/metrics",
+    response_class=PlainTextResponse,
+    description="Performance metrics in the Prometheus text format",
+)
+def get_metrics():
+    """
+    Expose request latency, in-flight requests, connection pool, audit write and report render metrics of this worker.
+
+    :return: Metrics in the Prometheus text exposition format
+    """
+    return PlainTextResponse(
+        render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
@@ -1,11 +1,14 @@
 from typing import List
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session
 
 from config.db import SessionLocal
+from helpers.instrumentation import query_budget
+from helpers.versioning import get_etag, is_not_modified, not_modified_response
 from models import models
-from routes.actions import auth_action
+from routes.actions import auth_action, product_action, sample_action
+from routes.actions.rack import invalidate_rack_occupancy
 from schemas import schemas
 
 products_router = APIRouter(prefix="/products", tags=["products"])
@@ -24,7 +27,14 @@ def get_db():
     response_model=List[schemas.Product],
     description="Get a list of products by product code or retrieve all products if no product code is provided",
 )
-def get_all_products(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+@query_budget(2)
+def get_all_products(
+    request: Request,
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    db: Session = Depends(get_db),
+):
     """
     Retrieve products by product code or all products if no product code is provided.
 
@@ -34,16 +44,48 @@ def get_all_products(skip: int = 0, limit: int = 100, db: Session = Depends(get_
     :param db: Database session dependency
     :return: List of products
     """
-    products = db.query(models.Product).offset(skip).limit(limit).all()
+    # Answer from the table version alone when the client copy is current
+    etag = get_etag(models.Product.__tablename__, skip, limit)
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+    response.headers["ETag"] = etag
+
+    products = product_action.get_products_page(db, skip, limit)
     return products
 
 
+@products_router.get(
+    "/suggest",
+    response_model=List[schemas.Product],
+    description="Suggest products by the start of their code or name",
+)
+@query_budget(2)
+def suggest_products(
+    q: str = Query(min_length=1), limit: int = 10, db: Session = Depends(get_db)
+):
+    """
+    Suggest products for autocomplete, answered from the in-memory catalog index.
+
+    :param q: Text typed so far, matched against the product code and the words of the product name
+    :param limit: Maximum number of suggestions (default: 10)
+    :param db: Database session dependency, only used to rebuild the index after a product write
+    :return: Matching products
+    """
+    return product_action.suggest_products(db, q, limit)
+
+
 @products_router.get(
     "/{product_code}",
     response_model=schemas.Product,
     description="Get a list of products by product code or retrieve all products if no product code is provided",
 )
-def get_products(product_code: str, db: Session = Depends(get_db)):
+@query_budget(2)
+def get_products(
+    request: Request,
+    response: Response,
+    product_code: str,
+    db: Session = Depends(get_db),
+):
     """
     Retrieve products by product code or all products if no product code is provided.
 
@@ -53,11 +95,12 @@ def get_products(product_code: str, db: Session = Depends(get_db)):
     :param db: Database session dependency
     :return: List of products
     """
-    product = (
-        db.query(models.Product)
-        .filter(models.Product.product_code == product_code)
-        .first()
-    )
+    etag = get_etag(models.Product.__tablename__, product_code)
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+    response.headers["ETag"] = etag
+
+    product = product_action.get_product(db, product_code)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
 
@@ -87,6 +130,7 @@ def create_new_product(product: schemas.ProductCreate, db: Session = Depends(get
     # Add the new sample to the database session and commit the transaction
     db.add(new_product)
     db.commit()
+    product_action.invalidate_product_catalog()
 
     # Refresh the object to ensure it reflects the latest state in the database
     db.refresh(new_product)
@@ -95,6 +139,22 @@ def create_new_product(product: schemas.ProductCreate, db: Session = Depends(get
     return new_product
 
 
+@products_router.post(
+    "/recompute-dates",
+    response_model=schemas.RecomputeResult,
+    description="Rebuild expiration and destroy dates of every sample",
+    dependencies=[Depends(auth_action.is_admin)],
+)
+def recompute_all_dates(db: Session = Depends(get_db)):
+    """
+    Recalculate the expiration and destroy dates of every sample from the current product shelf life.
+
+    :param db: Database session dependency
+    :return: Updated row counts and throughput of the job
+    """
+    return sample_action.recompute_all_sample_dates(db)
+
+
 @products_router.put(
     "/{product_code}",
     response_model=schemas.Product,
@@ -121,12 +181,23 @@ def update_product_by_id(
     if existing_product is None:
         raise HTTPException(status_code=404, detail="Product not found")
 
+    shelf_life_changed = existing_product.shelf_life != product.shelf_life
+
     # Update the attributes of the existing product with the new data
     for key, value in product.model_dump().items():
         setattr(existing_product, key, value)
 
+    # Keep the stored dates of existing samples in line with the new shelf life
+    if shelf_life_changed:
+        db.flush()
+        for SampleModel in (models.SampleRetained, models.SampleReferenced):
+            sample_action.recompute_sample_dates(
+                db, SampleModel, product_code=product_code
+            )
+
     # Commit the transaction to save the changes
     db.commit()
+    product_action.invalidate_product_catalog()
 
     # Return the updated product
     return existing_product
@@ -147,17 +218,22 @@ def delete_product_by_id(product_code: str, db: Session = Depends(get_db)):
     :return: Details of the deleted product
     """
     # Retrieve the product from the database
+    # Locked, so no sample of it can be stored until the delete commits
     product_to_delete = (
         db.query(models.Product)
         .filter(models.Product.product_code == product_code)
+        .with_for_update()
         .first()
     )
     if product_to_delete is None:
         raise HTTPException(status_code=404, detail="Product not found")
 
-    # Delete the product from the database
+    # Delete its samples server-side, then the product itself
+    sample_action.delete_samples_of(db, product_code=product_code)
     db.delete(product_to_delete)
     db.commit()
+    product_action.invalidate_product_catalog()
+    invalidate_rack_occupancy()
 
     # Return the details of the deleted product
     return product_to_delete
@@ -1,11 +1,23 @@
 from typing import List
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy.orm import Session
 
 from config.db import SessionLocal
+from helpers.instrumentation import query_budget
+from helpers.versioning import (
+    bump_version,
+    get_etag,
+    is_not_modified,
+    not_modified_response,
+)
 from models import models
-from routes.actions import auth_action
+from routes.actions import auth_action, sample_action
+from routes.actions.rack import (
+    get_rack_occupancy,
+    invalidate_rack_occupancy,
+    transfer_samples,
+)
 from schemas import schemas
 
 rack_router = APIRouter(prefix="/rack", tags=["rack"])
@@ -40,6 +52,8 @@ def create_new_rack(sample: schemas.RackCreate, db: Session = Depends(get_db)):
     # Add the new sample to the database session and commit the transaction
     db.add(new_rack)
     db.commit()
+    invalidate_rack_occupancy()
+    bump_version(models.Rack.__tablename__)
 
     # Refresh the object to ensure it reflects the latest state in the database
     db.refresh(new_rack)
@@ -53,16 +67,69 @@ def create_new_rack(sample: schemas.RackCreate, db: Session = Depends(get_db)):
     response_model=List[schemas.Rack],
     description="Get all product retained sample",
 )
-def get_all_racks(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+def get_all_racks(
+    request: Request,
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    db: Session = Depends(get_db),
+):
     """
     :param db: Database session dependency
     :return: List of retained samples for the specified product
     """
-    # Query the database to retrieve retained samples for the specified product
-    racks = db.query(models.Rack).offset(skip).limit(limit).all()
+    # Answer from the table version alone when the client copy is current
+    etag = get_etag(models.Rack.__tablename__, skip, limit)
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+    response.headers["ETag"] = etag
+
+    # Read from the primary, a replica behind the version would pin an
+    # outdated body to the current ETag
+    racks = (
+        db.query(models.Rack)
+        .offset(skip)
+        .limit(limit)
+        .execution_options(read_primary=True)
+        .all()
+    )
     return racks
 
 
+@rack_router.get(
+    "/occupancy",
+    response_model=List[schemas.RackOccupancy],
+    description="Get the fill level of every rack",
+)
+@query_budget(2)
+def get_racks_occupancy(db: Session = Depends(get_db)):
+    """
+    :param db: Database session dependency
+    :return: Capacity, retained count, referenced count and free slots of every rack
+    """
+    return get_rack_occupancy(db)
+
+
+@rack_router.post(
+    "/{rack_id}/transfer",
+    response_model=schemas.RackTransferResult,
+    description="Move samples of a rack to other racks",
+    dependencies=[Depends(auth_action.is_admin)],
+)
+def transfer_rack_samples(
+    rack_id: str, transfer: schemas.RackTransfer, db: Session = Depends(get_db)
+):
+    """
+    Move some or all samples of a rack to one or more target racks in a single transaction.
+
+    :param rack_id: Rack to move the samples from
+    :param transfer: Request body with the target racks in order of preference and an optional number of samples
+    :param db: Database session dependency
+    :return: Number of samples moved to every target rack
+    """
+    return transfer_samples(db, rack_id, transfer)
+
+
 @rack_router.get(
     "/{rack_id}", response_model=List[schemas.Rack], description="Get specified rack"
 )
@@ -105,6 +172,8 @@ def update_rack_by_id(
 
     # Commit the transaction to save the changes
     db.commit()
+    invalidate_rack_occupancy()
+    bump_version(models.Rack.__tablename__)
 
     # Return the updated product
     return existing_rack
@@ -125,15 +194,22 @@ def delete_rack_by_id(rack_id: str, db: Session = Depends(get_db)):
     :return: Details of the deleted product
     """
     # Retrieve the product from the database
+    # Locked, so no sample can be stored on it until the delete commits
     rack_to_delete = (
-        db.query(models.Rack).filter(models.Rack.rack_id == rack_id).first()
+        db.query(models.Rack)
+        .filter(models.Rack.rack_id == rack_id)
+        .with_for_update()
+        .first()
     )
     if rack_to_delete is None:
         raise HTTPException(status_code=404, detail="Rack not found")
 
-    # Delete the product from the database
+    # Delete its samples server-side, then the rack itself
+    sample_action.delete_samples_of(db, rack_id=rack_id)
     db.delete(rack_to_delete)
     db.commit()
+    invalidate_rack_occupancy()
+    bump_version(models.Rack.__tablename__)
 
     # Return the details of the deleted product
     return rack_to_delete
@@ -1,9 +1,12 @@
+from datetime import date
 from typing import List
 
-from fastapi import APIRouter, Depends, Response
+from fastapi import APIRouter, Depends, Query, Response
 from sqlalchemy.orm import Session
 
 from config.db import SessionLocal
+from helpers.instrumentation import query_budget
+from helpers.replica import read_replica
 from models import models
 from routes.actions import auth_action, sample_action
 from routes.actions.sample_action import create_sample
@@ -25,6 +28,7 @@ def get_db():
     response_model=List[schemas.Sample],
     description="Get all reference sample is stored",
 )
+@query_budget(9)
 def create_new_sample_referenced(
     sample: schemas.SampleCreate, db: Session = Depends(get_db)
 ):
@@ -39,50 +43,91 @@ def create_new_sample_referenced(
     return [new_sample]
 
 
+@reference_router.post(
+    "/bulk",
+    response_model=List[schemas.Sample],
+    description="Store a receipt of referenced samples in one transaction",
+)
+def create_new_samples_referenced_bulk(
+    samples: List[schemas.SampleCreate], db: Session = Depends(get_db)
+):
+    """
+    Create several referenced samples at once, spreading samples with an automatic rack across the emptiest racks.
+
+    :param samples: Request body containing details of the new samples
+    :param db: Database session dependency
+    :return: Details of the created samples
+    """
+    return sample_action.create_samples_bulk(
+        db, samples=samples, SampleModel=models.SampleReferenced
+    )
+
+
 @reference_router.get(
     "/",
     response_model=List[schemas.SampleProductJoin],
     description="Get all reference sample",
 )
+# A third query counts the matches when skip is past the last page
+@query_budget(3)
 def get_referenced_samples_for_product(
+    response: Response,
     id: str | None = None,
     skip: int | None = None,
     limit: int | None = None,
+    filters: schemas.SampleFilter = Depends(),
     db: Session = Depends(get_db),
 ):
     """
     Retrieve reference samples associated with a specific sample, or all reference samples if product_code isn't specified.
 
-
+    :param id: Optional. ID of the reference sample to retrieve
+    :param skip: Number of samples to skip
+    :param limit: Maximum number of samples to retrieve
+    :param filters: Rack, product, product type and date range filters and the sort keys
     :param db: Database session dependency
-    :return: List of reference samples for the specified sample
+    :return: List of reference samples, the total number of matches is in the X-Total-Count header
     """
     # Query the database to retrieve reference samples for the specified sample
     if id:
         samples = sample_action.get_sample_by_id(db, id, models.SampleReferenced)
+        total = len(samples)
     else:
-        samples = sample_action.get_all_sample(db, skip, limit, models.SampleReferenced)
-
-    samples = [
-        schemas.SampleProductJoin(
-            id=sample.id,
-            product_code=sample.product_code,
-            batch_number=sample.batch_number,
-            manufacturing_date=sample.manufacturing_date,
-            expiration_date=sample.expiration_date,
-            destroy_date=sample.destroy_date,
-            rack_id=sample.rack_id if sample.rack_id else "",
-            product_name=sample.product.product_name,
-            package=sample.product.package,
-            product_type=sample.product.product_type,
-            shelf_life=sample.product.shelf_life,
+        samples, total = sample_action.get_all_sample(
+            db, skip, limit, models.SampleReferenced, filters=filters
         )
-        for sample in samples
-    ]
+    response.headers["X-Total-Count"] = str(total)
+
+    samples = [sample_action.to_sample_product_join(sample) for sample in samples]
 
     return samples
 
 
+@reference_router.get(
+    "/search",
+    response_model=List[schemas.SampleProductJoin],
+    description="Search reference samples by batch number, product code or product name",
+)
+@query_budget(3)
+def search_reference_samples(
+    q: str = Query(min_length=1),
+    limit: int = Query(50, ge=1, le=200),
+    db: Session = Depends(get_db),
+):
+    """
+    Find reference samples whose batch number, product code or product name starts with the given text.
+
+    :param q: Prefix to look for, e.g. a scanned batch number
+    :param limit: Maximum number of samples to return (default: 50, at most 200)
+    :param db: Database session dependency
+    :return: Matching reference samples, newest first
+    """
+    samples = sample_action.search_samples(
+        db, q, limit, SampleModel=models.SampleReferenced
+    )
+    return [sample_action.to_sample_product_join(sample) for sample in samples]
+
+
 @reference_router.put(
     "/{id}",
     response_model=schemas.Sample,
@@ -135,6 +180,7 @@ def delete_retained_sample(id: str, db: Session = Depends(get_db)):
     response_model=List[schemas.SampleProductJoin],
     description="Get a sample with a specified destroy date",
 )
+@query_budget(2)
 def get_destroy_sample(month: int, year: int, type: str, db: Session = Depends(get_db)):
     destroy_samples = sample_action.get_destroy_by_month_year(
         db, month, year, type, SampleModel=models.SampleReferenced
@@ -142,9 +188,69 @@ def get_destroy_sample(month: int, year: int, type: str, db: Session = Depends(g
     return destroy_samples
 
 
+@reference_router.post(
+    "/mark-destroyed",
+    response_model=schemas.DestroyedResult,
+    description="Move the samples of an executed destroy report to history",
+    dependencies=[Depends(auth_action.is_admin)],
+)
+def mark_destroyed_samples(
+    month: int, year: int, type: str, db: Session = Depends(get_db)
+):
+    """
+    Move the reference samples of the destroy report of the given month, year and product type out of the live inventory into the history table.
+
+    :param month: Month of the destroy date
+    :param year: Year of the destroy date
+    :param type: Product type of the report
+    :param db: Database session dependency
+    :return: Number of samples moved
+    """
+    return sample_action.mark_destroyed(
+        db, month, year, type, SampleModel=models.SampleReferenced
+    )
+
+
+@reference_router.get(
+    "/history",
+    response_model=List[schemas.DestroyedSample],
+    description="Get destroyed reference samples",
+)
+def get_destroyed_samples(
+    product_code: str | None = None,
+    destroy_from: date | None = None,
+    destroy_to: date | None = None,
+    skip: int = 0,
+    limit: int = 100,
+    db: Session = Depends(get_db),
+):
+    """
+    Retrieve destroyed reference samples from the history table.
+
+    :param product_code: Optional. Only samples of this product
+    :param destroy_from: Optional. Only samples with a destroy date on or after this date
+    :param destroy_to: Optional. Only samples with a destroy date on or before this date
+    :param skip: Number of samples to skip (default: 0)
+    :param limit: Maximum number of samples to retrieve (default: 100)
+    :param db: Database session dependency
+    :return: Destroyed reference samples, newest destroy date first
+    """
+    samples = sample_action.get_destroyed_samples(
+        db,
+        skip,
+        limit,
+        SampleModel=models.SampleReferenced,
+        product_code=product_code,
+        destroy_from=destroy_from,
+        destroy_to=destroy_to,
+    )
+    return [sample_action.to_destroyed_sample(sample) for sample in samples]
+
+
 @reference_router.post(
     "/generate-destroy-report", description="Generate destroy reports"
 )
+@read_replica
 def generate_destroy_reports(
     month: int,
     year: int,
@@ -152,10 +258,8 @@ def generate_destroy_reports(
     package_weight: List[schemas.DestroySampleWeight],
     db: Session = Depends(get_db),
 ):
-    pdf, headers = sample_action.create_destroy_reports(
+    content, headers = sample_action.create_destroy_reports(
         db, month, year, package_type, package_weight, models.SampleReferenced
     )
 
-    return Response(
-        content=bytes(pdf.output()), media_type="application/pdf", headers=headers
-    )
+    return Response(content=content, media_type="application/pdf", headers=headers)
@@ -0,0 +1,69 @@
+from typing import List
+
+from fastapi import APIRouter, Depends, Response
+from sqlalchemy.orm import Session
+
+from config.db import SessionLocal
+from helpers.instrumentation import query_budget
+from helpers.replica import read_replica
+from routes.actions import sample_action
+from schemas import schemas
+
+samples_router = APIRouter(prefix="/samples", tags=["samples"])
+
+
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@samples_router.get(
+    "/destroy",
+    response_model=List[schemas.SampleDestroyJoin],
+    description="Get retained and reference samples with a specified destroy date",
+)
+@query_budget(2)
+def get_destroy_samples(
+    month: int, year: int, type: str, db: Session = Depends(get_db)
+):
+    """
+    Retrieve the retained and reference samples to destroy in one list.
+
+    :param month: Month of the destroy date
+    :param year: Year of the destroy date
+    :param type: Product type of the samples
+    :param db: Database session dependency
+    :return: Samples of both types, tagged with their sample_type
+    """
+    return sample_action.get_destroy_all_types(db, month, year, type)
+
+
+@samples_router.post(
+    "/generate-destroy-report", description="Generate a combined destroy report"
+)
+@read_replica
+def generate_destroy_report(
+    month: int,
+    year: int,
+    package_type: str,
+    package_weight: schemas.CombinedDestroyWeight,
+    db: Session = Depends(get_db),
+):
+    """
+    Generate one destroy report with a retained and a reference section.
+
+    :param month: Month of the destroy date
+    :param year: Year of the destroy date
+    :param package_type: Product type of the report
+    :param package_weight: Weight of each product, per sample type
+    :param db: Database session dependency
+    :return: The report as a PDF download
+    """
+    content, headers = sample_action.create_combined_destroy_report(
+        db, month, year, package_type, package_weight
+    )
+
+    return Response(content=content, media_type="application/pdf", headers=headers)
@@ -1,8 +1,13 @@
+from typing import List
+
 from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
 
 from config.db import SessionLocal
+from helpers.audit_sink import audit_sink
 from models import models
+from routes.actions.product_action import product_cache
+from schemas import schemas
 
 stats_router = APIRouter(prefix="/stats", tags=["stats"])
 
@@ -34,12 +39,16 @@ def get_retained_count(db: Session = Depends(get_db)):
 
 
 @stats_router.get("/audit/count", response_model=int)
-def get_audit_count(db: Session = Depends(get_db)):
-    count_result = db.query(models.Audit).count()
-    return count_result
+def get_audit_count():
+    return audit_sink.count()
 
 
 @stats_router.get("/users/count", response_model=int)
 def get_users_count(db: Session = Depends(get_db)):
     count_result = db.query(models.User).count()
     return count_result
+
+
+@stats_router.get("/cache", response_model=List[schemas.CacheStats])
+def get_cache_stats():
+    return [product_cache.stats()]
@@ -1,4 +1,5 @@
 import datetime
+from typing import List
 
 from pydantic import BaseModel
 
@@ -10,3 +11,22 @@ class AuditOutput(BaseModel):
     method: str
     request: str
     timestamp: datetime.datetime
+
+
+class AuditPurgeResult(BaseModel):
+    cutoff: datetime.datetime | None
+    archived_rows: int
+    dropped_partitions: List[str]
+    deleted_rows: int
+    elapsed_seconds: float
+
+
+class ArchiveSegment(BaseModel):
+    segment: str
+    month: str
+    first_id: int
+    last_id: int
+    first_time: datetime.datetime
+    last_time: datetime.datetime
+    rows: int
+    bytes: int
@@ -0,0 +1,54 @@
+import datetime
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+
+class SlowQuery(BaseModel):
+    statement: str
+    parameters: str
+    duration_ms: float
+    route: Optional[str] = None
+    timestamp: datetime.datetime
+    explain: Optional[List[dict]] = None
+
+
+class ReplicaStatus(BaseModel):
+    configured: bool
+    healthy: bool
+    lag_seconds: Optional[float] = None
+    max_lag_seconds: float
+    checked_at: Optional[datetime.datetime] = None
+    error: Optional[str] = None
+
+
+class EngineSettings(BaseModel):
+    pool_size: int
+    max_overflow: int
+    pool_timeout: float
+    pool_recycle: int
+    pool_pre_ping: bool
+    statement_timeout_ms: int
+    driver: str
+
+
+class PoolStatus(BaseModel):
+    database: str
+    driver: str
+    size: int
+    capacity: int
+    checked_in: int
+    checked_out: int
+    overflow: int
+    available: int
+    checkouts: int
+    timeouts: int
+    invalidations: int
+    wait_avg_ms: float
+    wait_max_ms: float
+    longest_checkout_ms: float
+
+
+class PoolDiagnostics(BaseModel):
+    settings: EngineSettings
+    pools: List[PoolStatus]
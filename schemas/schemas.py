@@ -46,7 +46,10 @@ class SampleCreate(BaseModel):
     product_code: str
     batch_number: str
     manufacturing_date: date
-    rack_id: str | None
+    # "auto" (the default) lets the server pick a rack with free capacity
+    rack_id: str | None = "auto"
+    # Preferred rack location when the rack is picked automatically
+    location: str | None = None
 
 
 class SampleUpdate(BaseModel):
@@ -79,6 +82,25 @@ class SampleProductJoin(Sample, Product):
     pass
 
 
+class SampleDestroyJoin(SampleProductJoin):
+    # "retained" or "referenced"
+    sample_type: str
+
+
+class SampleFilter(BaseModel):
+    rack_id: Optional[str] = None
+    product_code: Optional[str] = None
+    product_type: Optional[str] = None
+    manufactured_from: Optional[date] = None
+    manufactured_to: Optional[date] = None
+    expires_from: Optional[date] = None
+    expires_to: Optional[date] = None
+    destroy_from: Optional[date] = None
+    destroy_to: Optional[date] = None
+    # Comma-separated sort keys, prefixed with "-" for descending order
+    sort: str = "id"
+
+
 class RackBase(BaseModel):
     location: str
     max_stored: int
@@ -99,6 +121,34 @@ class Rack(RackBase):
         from_attributes = True
 
 
+class RackOccupancy(BaseModel):
+    rack_id: str
+    location: str | None
+    max_stored: int
+    retained_count: int
+    referenced_count: int
+    free_slots: int
+
+
+class RackTransfer(BaseModel):
+    # Racks to fill, in order of preference
+    targets: List[str] = Field(min_length=1)
+    # Number of samples to move, every sample on the rack if not given
+    limit: Optional[int] = Field(None, gt=0)
+
+
+class RackTransferMove(BaseModel):
+    rack_id: str
+    retained: int
+    referenced: int
+
+
+class RackTransferResult(BaseModel):
+    source: str
+    moved: List[RackTransferMove]
+    total: int
+
+
 class DestroyReports(BaseModel):
     samples: List[int]
 
@@ -110,11 +160,49 @@ class DestroyObject(BaseModel):
     expiration_date: date
     destroy_date: date
     batch_numbers: str
-    shelf_life: int
+    shelf_life: float
     package: str = ""
     weight: float = 0.0
 
 
+class DestroyedSample(Sample):
+    # History rows outlive their product, whose details are then empty
+    product_name: Optional[str] = None
+    shelf_life: Optional[float] = None
+    product_type: Optional[str] = None
+    package: Optional[str] = None
+
+
+class DestroyedResult(BaseModel):
+    month: int
+    year: int
+    product_type: str
+    moved: int
+
+
 class DestroySampleWeight(BaseModel):
     product_code: str
     weight: float
+
+
+class CombinedDestroyWeight(BaseModel):
+    retained: List[DestroySampleWeight] = []
+    referenced: List[DestroySampleWeight] = []
+
+
+class RecomputeResult(BaseModel):
+    retained: int
+    referenced: int
+    elapsed_seconds: float
+    rows_per_second: float
+
+
+class CacheStats(BaseModel):
+    namespace: str
+    ttl: float
+    size: int
+    generation: int
+    hits: int
+    misses: int
+    expired: int
+    invalidations: int
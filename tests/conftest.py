@@ -0,0 +1,71 @@
+import os
+import tempfile
+
+import pytest
+
+# Settings are read when the app modules are imported, so they are set first
+_database = os.path.join(tempfile.mkdtemp(prefix="b7-tests-"), "b7.db")
+os.environ.update(
+    {
+        "DATABASE_URL": f"sqlite:///{_database}",
+        "REPLICA_DATABASE_URL": "",
+        "ALLOWED_ORIGINS": "http://localhost",
+        "CACHE_BACKEND": "memory",
+        "AUDIT_SINK": "sql",
+        "REQUEST_LOG": "false",
+        "QUERY_DEBUG": "true",
+        "QUERY_BUDGET_STRICT": "true",
+    }
+)
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from config.db import SessionLocal, engine  # noqa: E402
+from helpers import auth_utils  # noqa: E402
+from models import models  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def app():
+    import app as application
+
+    models.Base.metadata.create_all(engine)
+    with SessionLocal() as db:
+        db.add_all(
+            [
+                models.Rack(rack_id="A1", max_stored=50, location="L1"),
+                models.Rack(rack_id="B1", max_stored=50, location="L2"),
+                models.Product(
+                    product_code="P1",
+                    product_name="Prodigy",
+                    shelf_life=2,
+                    product_type="T",
+                    package="box",
+                ),
+                models.Product(
+                    product_code="P2",
+                    product_name="Other",
+                    shelf_life=1.5,
+                    product_type="T",
+                    package="bag",
+                ),
+                models.User(
+                    username="admin",
+                    password=auth_utils.hash_pass("admin"),
+                    is_admin=True,
+                ),
+            ]
+        )
+        db.commit()
+
+    return application.app
+
+
+@pytest.fixture(scope="session")
+def client(app):
+    client = TestClient(app)
+    response = client.post(
+        "/authentication/login", data={"username": "admin", "password": "admin"}
+    )
+    client.headers["Authorization"] = f"Bearer {response.json()['access_token']}"
+    return client
@@ -0,0 +1,82 @@
+import pytest
+from fastapi import Depends
+from sqlalchemy.orm import Session
+
+from config.db import SessionLocal
+from helpers.instrumentation import query_budget
+from models import models
+from routes.actions.rack import occupancy_index
+from routes.rack import get_db
+
+SAMPLE = {
+    "product_code": "P1",
+    "batch_number": "B001",
+    "manufacturing_date": "2024-01-01",
+}
+
+# One request for every route that declares a query budget
+BUDGETED_REQUESTS = [
+    ("POST", "/retained/", {**SAMPLE, "rack_id": "A1"}),
+    ("POST", "/reference/", {**SAMPLE, "rack_id": "auto"}),
+    ("GET", "/retained/?limit=10", None),
+    ("GET", "/reference/?limit=10", None),
+    ("GET", "/retained/search?q=P1", None),
+    ("GET", "/reference/search?q=B0", None),
+    ("GET", "/retained/destroy?month=2&year=2027&type=T", None),
+    ("GET", "/reference/destroy?month=2&year=2027&type=T", None),
+    ("GET", "/samples/destroy?month=2&year=2027&type=T", None),
+    ("GET", "/products/", None),
+    ("GET", "/products/suggest?q=Pro", None),
+    ("GET", "/products/P1", None),
+    ("GET", "/rack/occupancy", None),
+]
+ROUTE_PATHS = {"/products/P1": "/products/{product_code}"}
+
+
+@pytest.fixture(autouse=True, scope="module")
+def warm_occupancy_index(app):
+    # The index is loaded once per process, budgets cover the requests after
+    with SessionLocal() as db:
+        occupancy_index.snapshot(db)
+
+
+def test_every_budgeted_route_is_covered(app):
+    budgeted = {
+        (method, route.path)
+        for route in app.routes
+        if getattr(getattr(route, "endpoint", None), "__query_budget__", None)
+        for method in route.methods
+    }
+    covered = {
+        (method, ROUTE_PATHS.get(path, path).split("?")[0])
+        for method, path, _ in BUDGETED_REQUESTS
+    }
+
+    assert budgeted - covered == set()
+
+
+@pytest.mark.parametrize("method,path,body", BUDGETED_REQUESTS)
+def test_route_stays_within_query_budget(client, method, path, body):
+    response = client.request(method, path, json=body)
+
+    assert response.status_code != 500, response.text
+    assert "X-Query-Warnings" not in response.headers
+
+
+def test_n_plus_one_is_flagged(app, client):
+    @query_budget(10)
+    def racks_one_by_one(db: Session = Depends(get_db)):
+        # Deliberate N+1: one lookup per rack instead of a single query
+        return [
+            db.query(models.Rack)
+            .filter(models.Rack.rack_id == rack_id)
+            .first()
+            .location
+            for rack_id in ("A1", "B1", "A1", "B1")
+        ]
+
+    app.add_api_route("/tests/n-plus-one", racks_one_by_one)
+    response = client.get("/tests/n-plus-one")
+
+    assert response.status_code == 500
+    assert any("N+1 pattern" in problem for problem in response.json()["detail"])